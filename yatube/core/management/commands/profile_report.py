@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+
+from core.profiling import report, reset
+
+SORT_FIELDS = ('seconds', 'queries', 'render_seconds', 'bytes', 'requests')
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает сводку профилировщика запросов: время, запросы к базе, '
+        'рендер, кэш и размер ответа по вьюхам, затем медленные запросы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=SORT_FIELDS, default='seconds')
+        parser.add_argument('--slow', type=int, default=10)
+        parser.add_argument('--reset', action='store_true')
+
+    def handle(self, *args, **options):
+        data = report()
+        self.stdout.write(
+            '{:<32} {:>7} {:>8} {:>8} {:>7} {:>8} {:>8} {:>6} {:>9}'.format(
+                'view', 'reqs', 'avg ms', 'max ms', 'sql', 'sql ms',
+                'tpl ms', 'hit %', 'avg KB',
+            )
+        )
+        views = sorted(
+            data['views'].items(),
+            key=lambda item: item[1][options['sort']], reverse=True,
+        )
+        for view, totals in views:
+            requests = totals['requests']
+            lookups = totals['cache_hits'] + totals['cache_misses']
+            self.stdout.write(
+                '{:<32} {:>7} {:>8.1f} {:>8.1f} {:>7.1f} {:>8.1f} '
+                '{:>8.1f} {:>6} {:>9.1f}'.format(
+                    view[:32], requests,
+                    totals['seconds'] * 1000 / requests,
+                    totals['max_seconds'] * 1000,
+                    totals['queries'] / requests,
+                    totals['query_seconds'] * 1000 / requests,
+                    totals['render_seconds'] * 1000 / requests,
+                    '{:.0%}'.format(totals['cache_hits'] / lookups)
+                    if lookups else '-',
+                    totals['bytes'] / 1024 / requests,
+                )
+            )
+        for sample in data['slow'][:options['slow']]:
+            self.stdout.write('\n{:.0f} ms {} {} ({})'.format(
+                sample['seconds'] * 1000, sample['status'], sample['path'],
+                'вне выборки, SQL не записан' if sample['queries'] is None
+                else '{} sql, {:.0f} ms'.format(
+                    sample['queries'], sample['query_seconds'] * 1000
+                ),
+            ))
+            for sql, count, seconds in sample['top_queries']:
+                self.stdout.write('  {:>4} x {:>7.1f} ms  {}'.format(
+                    count, seconds * 1000, sql[:200]
+                ))
+        if options['reset']:
+            reset()
+            self.stdout.write(self.style.SUCCESS('Сводка сброшена'))
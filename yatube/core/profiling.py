@@ -0,0 +1,321 @@
+import os
+import random
+import re
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+PROCESS_KEY = 'profiling:{}:{}'
+REGISTRY_KEY = 'profiling:processes'
+REGISTRY_LOCK_KEY = 'profiling:processes:lock'
+REGISTRY_LOCK_TIMEOUT = 5
+FIELDS = (
+    'requests', 'seconds', 'max_seconds', 'queries', 'query_seconds',
+    'render_seconds', 'cache_hits', 'cache_misses', 'bytes', 'slow',
+)
+FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+_local = threading.local()
+
+
+def fingerprint(sql):
+    """SQL без значений: одинаковые запросы с разными параметрами совпадут."""
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class Recording:
+    """Замеры одного запроса; подключается к базе как execute_wrapper."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.render_seconds = 0.0
+        self.render_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def top_queries(self, limit):
+        """Самые долгие по сумме отпечатки запросов: (SQL, число, время)."""
+        totals = {}
+        for sql, seconds in self.queries:
+            total = totals.setdefault(fingerprint(sql), [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+        return sorted(
+            ([sql, count, seconds] for sql, (count, seconds) in
+             totals.items()),
+            key=lambda item: item[2], reverse=True,
+        )[:limit]
+
+
+def current():
+    """Замеры текущего запроса или None, если он не профилируется."""
+    return getattr(_local, 'recording', None)
+
+
+def record_cache(hit):
+    """Учитывает попадание или промах кэша в текущем запросе."""
+    recording = current()
+    if recording is not None:
+        if hit:
+            recording.cache_hits += 1
+        else:
+            recording.cache_misses += 1
+
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        recording = current()
+        if recording is None:
+            return super().render(context, request)
+        recording.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            recording.render_depth -= 1
+            if not recording.render_depth:
+                recording.render_seconds += time.perf_counter() - started
+
+
+class ProfiledTemplates(DjangoTemplates):
+    """
+    Шаблонный бэкенд Django, замеряющий время рендера.
+
+    Вложенные рендеры (render_to_string из тегов) входят во время
+    внешнего и отдельно не складываются.
+    """
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return ProfiledTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class Stats:
+    """
+    Сводка по вьюхам одного процесса.
+
+    Раз в PROFILING_FLUSH_INTERVAL секунд сводка целиком кладётся в кэш
+    под ключом процесса, так что запись в кэш не зависит от числа
+    запросов. Ключ процесса вносится в общий реестр, по которому отчёт
+    собирает сводки всех процессов.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.key = PROCESS_KEY.format(socket.gethostname(), os.getpid())
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.views = {}
+            self.slow = deque(maxlen=settings.PROFILING_SLOW_SAMPLES)
+            self.flushed = time.monotonic()
+
+    def add(self, request, response, recording):
+        """Учитывает замеренный запрос в сводке по вьюхе."""
+        seconds = time.perf_counter() - recording.started
+        view = self._view(request)
+        size = 0 if response.streaming else len(response.content)
+        query_seconds = sum(seconds for _, seconds in recording.queries)
+        slow = self._is_slow(seconds)
+        with self.lock:
+            totals = self.views.setdefault(view, dict.fromkeys(FIELDS, 0))
+            totals['requests'] += 1
+            totals['seconds'] += seconds
+            totals['max_seconds'] = max(totals['max_seconds'], seconds)
+            totals['queries'] += len(recording.queries)
+            totals['query_seconds'] += query_seconds
+            totals['render_seconds'] += recording.render_seconds
+            totals['cache_hits'] += recording.cache_hits
+            totals['cache_misses'] += recording.cache_misses
+            totals['bytes'] += size
+            totals['slow'] += slow
+        if slow:
+            self.slow.append(dict(
+                self._sample(request, response, view, seconds),
+                queries=len(recording.queries),
+                query_seconds=query_seconds,
+                render_seconds=recording.render_seconds,
+                top_queries=recording.top_queries(
+                    settings.PROFILING_TOP_QUERIES
+                ),
+            ))
+        self._maybe_flush()
+
+    def add_unsampled(self, request, response, seconds):
+        """
+        Запрос вне выборки: в сводку не идёт, но медленный запоминается.
+
+        Запросы к базе у него не записывались, поэтому в образце есть
+        только время и адрес.
+        """
+        if self._is_slow(seconds):
+            self.slow.append(dict(
+                self._sample(request, response, self._view(request), seconds),
+                queries=None,
+                query_seconds=None,
+                render_seconds=None,
+                top_queries=[],
+            ))
+        self._maybe_flush()
+
+    def _view(self, request):
+        match = request.resolver_match
+        return match.view_name if match else 'unresolved'
+
+    def _is_slow(self, seconds):
+        return seconds * 1000 >= settings.PROFILING_SLOW_MS
+
+    def _sample(self, request, response, view, seconds):
+        return {
+            'view': view,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'seconds': seconds,
+        }
+
+    def _maybe_flush(self):
+        if time.monotonic() - self.flushed >= (
+            settings.PROFILING_FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def snapshot(self):
+        """Копия сводки процесса."""
+        with self.lock:
+            return {
+                'views': {
+                    view: dict(totals) for view, totals in self.views.items()
+                },
+                'slow': list(self.slow),
+            }
+
+    def flush(self):
+        snapshot = self.snapshot()
+        self.flushed = time.monotonic()
+        cache.set(self.key, snapshot, settings.PROFILING_TTL)
+        self.register()
+
+    def register(self):
+        """
+        Вносит ключ процесса в реестр и продлевает реестру срок.
+
+        Реестр меняется под блокировкой через cache.add, чтобы процессы
+        не затирали записи друг друга; заодно из него выпадают процессы,
+        чьи сводки истекли. Если блокировка занята, процесс попадёт в
+        реестр при следующем сбросе.
+        """
+        if not cache.add(REGISTRY_LOCK_KEY, 1, REGISTRY_LOCK_TIMEOUT):
+            return
+        try:
+            keys = cache.get(REGISTRY_KEY, [])
+            alive = cache.get_many(keys)
+            keys = [key for key in keys if key in alive and key != self.key]
+            cache.set(
+                REGISTRY_KEY, keys + [self.key], settings.PROFILING_TTL
+            )
+        finally:
+            cache.delete(REGISTRY_LOCK_KEY)
+
+
+stats = Stats()
+
+
+def report():
+    """
+    Сводка всех процессов: суммы по вьюхам и медленные запросы.
+
+    Процессы видят друг друга только через общий кэш; с LocMemCache
+    в отчёт попадает лишь текущий процесс. Его сводка берётся из
+    памяти: процесс, только читающий отчёт, в реестр не попадает.
+    """
+    views = {}
+    slow = []
+    keys = [key for key in cache.get(REGISTRY_KEY, []) if key != stats.key]
+    snapshots = list(cache.get_many(keys).values()) + [stats.snapshot()]
+    for snapshot in snapshots:
+        for view, totals in snapshot['views'].items():
+            merged = views.setdefault(view, dict.fromkeys(FIELDS, 0))
+            for field, value in totals.items():
+                if field == 'max_seconds':
+                    merged[field] = max(merged[field], value)
+                else:
+                    merged[field] += value
+        slow.extend(snapshot['slow'])
+    slow.sort(key=lambda sample: sample['seconds'], reverse=True)
+    return {'views': views, 'slow': slow}
+
+
+def reset():
+    """Забывает сводки всех процессов."""
+    stats.clear()
+    cache.delete_many(cache.get(REGISTRY_KEY, []) + [REGISTRY_KEY])
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует долю PROFILING_SAMPLE_RATE запросов.
+
+    Считает запросы к базе и их время, время рендера шаблонов, попадания
+    в кэш страниц, размер ответа. Для запросов дольше PROFILING_SLOW_MS
+    сохраняет самые долгие отпечатки SQL. Остальные запросы только
+    засекаются: медленные из них тоже попадают в отчёт, но без SQL.
+    Ставится первым, чтобы в замер попали остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            started = time.perf_counter()
+            response = self.get_response(request)
+            stats.add_unsampled(
+                request, response, time.perf_counter() - started
+            )
+            return response
+        recording = Recording()
+        _local.recording = recording
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recording))
+                response = self.get_response(request)
+        finally:
+            _local.recording = None
+        stats.add(request, response, recording)
+        return response
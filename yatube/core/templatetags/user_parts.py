@@ -0,0 +1,71 @@
+import re
+import uuid
+
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+PLACEHOLDER = '<!--user-part {}:{}-->'
+PLACEHOLDER_RE = r'<!--user-part {}:(\d+)-->'
+
+
+@register.simple_tag(takes_context=True)
+def user_part(context, template_name, **kwargs):
+    """
+    Вставляет часть страницы, зависящую от пользователя.
+
+    Если страница рендерится для общего кэша (см. punch_holes), вместо
+    части выводится метка с одноразовым nonce, а шаблон и параметры
+    запоминаются на запросе; stitch() заменит метку на ответ для
+    конкретного пользователя. Параметры должны пиклиться: они
+    хранятся в кэше вместе со страницей.
+    """
+    request = context.get('request')
+    holes = getattr(request, 'holes', None)
+    if holes is not None:
+        holes['parts'].append((template_name, kwargs))
+        return mark_safe(
+            PLACEHOLDER.format(holes['nonce'], len(holes['parts']) - 1)
+        )
+    return render_to_string(template_name, kwargs, request=request)
+
+
+def punch_holes(view, request, *args, **kwargs):
+    """
+    Вызывает вьюху, оставляя в ответе метки вместо частей пользователя.
+
+    Метки помечены nonce этого рендера, поэтому такой же текст в
+    содержимом страницы (например, в тексте поста) не примет за метку.
+    Части сохраняются на самом ответе и попадают в кэш вместе с ним.
+    """
+    request.holes = {'nonce': uuid.uuid4().hex, 'parts': []}
+    try:
+        response = view(request, *args, **kwargs)
+    finally:
+        holes = request.holes
+        del request.holes
+    if holes['parts']:
+        response.user_parts = holes
+    return response
+
+
+def stitch(request, response):
+    """Подставляет в ответ из punch_holes части текущего пользователя."""
+    holes = getattr(response, 'user_parts', None)
+    if holes is None or response.streaming:
+        return response
+    if not response.get('Content-Type', '').startswith('text/html'):
+        return response
+    parts = holes['parts']
+
+    def render_part(match):
+        template_name, context = parts[int(match.group(1))]
+        return render_to_string(template_name, context, request=request)
+
+    placeholder_re = re.compile(PLACEHOLDER_RE.format(holes['nonce']))
+    response.content = placeholder_re.sub(
+        render_part, response.content.decode(response.charset)
+    )
+    return response
@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .profiling import report
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -11,3 +15,9 @@ def csrf_failure(request, reason=''):
 
 def error_500(request):
     return render(request, 'certman/500.html', status=500)
+
+
+@staff_member_required
+def profiling_report(request):
+    """Сводка профилировщика запросов в JSON, только для персонала."""
+    return JsonResponse(report(), json_dumps_params={'ensure_ascii': False})
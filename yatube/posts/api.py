@@ -0,0 +1,150 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import urlencode
+
+from .caching import INDEX, cache_response_versioned, condition_versioned
+from .feeds import feed_page, feed_scopes
+from .models import Group, Post, User
+from .paginators import DEFAULT_KEY, get_page
+from .views import COMMENTS_KEY, group_scopes, post_scopes, profile_scopes
+
+
+def json_response(data, **kwargs):
+    return JsonResponse(
+        data, json_dumps_params={'ensure_ascii': False}, **kwargs
+    )
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'updated': post.updated,
+        'author': {
+            'username': post.author.username,
+            'full_name': post.author.get_full_name(),
+        },
+        'group': {
+            'slug': post.group.slug,
+            'title': post.group.title,
+        } if post.group_id else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def _link(request, **params):
+    return '{}?{}'.format(request.path, urlencode(params))
+
+
+def feed_response(request, queryset, key=DEFAULT_KEY):
+    """Страница ленты в JSON со ссылками на соседние страницы."""
+    return page_response(request, get_page(request, queryset, key=key))
+
+
+def page_links(request, page_obj):
+    """Ссылки на следующую и предыдущую страницы или None."""
+    paginator = page_obj.paginator
+    if getattr(paginator, 'cursor_mode', False):
+        next_link = page_obj.has_next() and _link(
+            request, after=paginator.next_cursor
+        )
+        previous_link = page_obj.has_previous() and _link(
+            request, before=paginator.previous_cursor
+        )
+    else:
+        next_link = page_obj.has_next() and _link(
+            request, page=page_obj.next_page_number()
+        )
+        previous_link = page_obj.has_previous() and _link(
+            request, page=page_obj.previous_page_number()
+        )
+    return {'next': next_link or None, 'previous': previous_link or None}
+
+
+def page_response(request, page_obj):
+    return json_response({
+        'results': [serialize_post(post) for post in page_obj],
+        **page_links(request, page_obj),
+    })
+
+
+@condition_versioned(lambda request: (INDEX,))
+@cache_response_versioned(lambda request: (INDEX,))
+def index(request):
+    """Главная лента."""
+    return feed_response(request, Post.objects.for_feed())
+
+
+@condition_versioned(group_scopes)
+@cache_response_versioned(group_scopes)
+def group_posts(request, slug):
+    """Лента группы."""
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.post_set.for_feed())
+
+
+@condition_versioned(profile_scopes)
+@cache_response_versioned(profile_scopes)
+def profile(request, username):
+    """Посты автора."""
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.for_feed())
+
+
+def follow_scopes(request):
+    return feed_scopes(request.user.pk)
+
+
+def _require_login(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return json_response(
+                {'detail': 'Нужно войти в систему.'}, status=401
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+@_require_login
+@condition_versioned(follow_scopes, vary_on_user=True)
+def follow_index(request):
+    """Лента подписок текущего пользователя."""
+    return page_response(request, feed_page(request))
+
+
+@condition_versioned(post_scopes)
+@cache_response_versioned(post_scopes)
+def post_detail(request, post_id):
+    """
+    Пост со страницей комментариев.
+
+    Комментарии листаются по курсору от старых к новым, как на странице
+    поста; next и previous ведут на соседние страницы комментариев.
+    """
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    comments = get_page(
+        request,
+        post.comments.select_related('author'),
+        per_page=settings.COMMENTS_PER_PAGE,
+        key=COMMENTS_KEY,
+        descending=False,
+    )
+    data = serialize_post(post)
+    data['comments'] = [
+        {
+            'id': comment.pk,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created,
+        }
+        for comment in comments
+    ]
+    data.update(page_links(request, comments))
+    return json_response(data)
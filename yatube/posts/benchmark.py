@@ -0,0 +1,454 @@
+import math
+import random
+import subprocess
+import threading
+import time
+from datetime import timedelta
+from itertools import accumulate
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.profiling import Recording
+
+from . import feeds, graph
+from .models import Comment, FeedEntry, Follow, Group, Post, User, UserStats
+from .paginators import CursorPaginator, MergedCursorPaginator
+from .transfer import batches, finish_import, keep_timestamps
+
+PREFIX = 'bench'
+PASSWORD = 'bench-password'
+FEED_PREFIX = 'feedbench'
+WORDS = (
+    'пост', 'лента', 'подписка', 'группа', 'автор', 'картинка', 'день',
+    'новости', 'город', 'кот', 'книга', 'музыка', 'утро', 'вечер', 'код',
+)
+
+
+def popularity(count, skew=1.0):
+    """
+    Накопленные веса Ципфа для count элементов: первые популярнее.
+
+    С ними random.choices быстро выбирает авторов постов и подписок так,
+    что у немногих «звёзд» оказываются тысячи подписчиков.
+    """
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+def seed(users, posts, groups=10, follows=20, comments=1, batch_size=5000,
+         rnd_seed=0, write=lambda message: None):
+    """
+    Быстро наполняет базу синтетическими данными через bulk_create.
+
+    Пользователи называются bench<N> с общим паролем PASSWORD. Посты и
+    подписки распределены по Ципфу, даты постов идут назад от текущего
+    момента. Сигналы при bulk_create не срабатывают, поэтому счётчики и
+    ленты в конце пересчитываются один раз, как после import_data.
+    """
+    rnd = random.Random(rnd_seed)
+    password = make_password(PASSWORD)
+    offset = User.objects.filter(username__startswith=PREFIX).count()
+    started = time.monotonic()
+
+    def created(table, count):
+        write('{}: {} строк, {:.1f} с'.format(
+            table, count, time.monotonic() - started
+        ))
+
+    for chunk in batches(range(offset, offset + users), batch_size):
+        User.objects.bulk_create(
+            User(username='{}{}'.format(PREFIX, number), password=password)
+            for number in chunk
+        )
+    created('users', users)
+    Group.objects.bulk_create(
+        (
+            Group(
+                title='Группа {}'.format(number),
+                slug='{}-{}'.format(PREFIX, number),
+                description='Группа для нагрузочных тестов',
+            )
+            for number in range(groups)
+        ),
+        ignore_conflicts=True,
+    )
+    created('groups', groups)
+    user_ids = list(User.objects.filter(
+        username__startswith=PREFIX
+    ).order_by('pk').values_list('pk', flat=True))
+    group_ids = list(Group.objects.filter(
+        slug__startswith=PREFIX + '-'
+    ).values_list('pk', flat=True)) + [None]
+    weights = popularity(len(user_ids))
+    now = timezone.now()
+    with keep_timestamps(Post):
+        for chunk in batches(range(posts), batch_size):
+            authors = rnd.choices(user_ids, cum_weights=weights, k=len(chunk))
+            Post.objects.bulk_create(
+                Post(
+                    author_id=author_id,
+                    group_id=rnd.choice(group_ids),
+                    text=' '.join(rnd.choices(WORDS, k=rnd.randint(5, 40))),
+                    pub_date=now - timedelta(minutes=number),
+                    updated=now - timedelta(minutes=number),
+                )
+                for number, author_id in zip(chunk, authors)
+            )
+    created('posts', posts)
+    follow_rows = (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in set(rnd.choices(
+            user_ids, cum_weights=weights, k=follows
+        )) - {user_id}
+    )
+    for chunk in batches(follow_rows, batch_size):
+        Follow.objects.bulk_create(chunk, ignore_conflicts=True)
+    created('follows', Follow.objects.count())
+    bounds = Post.objects.order_by('pk').values_list('pk', flat=True)
+    first, last = bounds.first(), bounds.last()
+    if first is not None and comments:
+        with keep_timestamps(Comment):
+            for chunk in batches(range(posts * comments), batch_size):
+                Comment.objects.bulk_create(
+                    Comment(
+                        post_id=rnd.randint(first, last),
+                        author_id=rnd.choice(user_ids),
+                        text=' '.join(rnd.choices(WORDS, k=8)),
+                        created=now - timedelta(seconds=number),
+                    )
+                    for number in chunk
+                )
+        created('comments', posts * comments)
+    created('feeds', finish_import(set()))
+
+
+def dataset():
+    """Размеры таблиц: пишутся в результаты рядом с замерами."""
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def current_commit():
+    """Короткий хеш текущего коммита или None вне git."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу из отсортированного списка."""
+    if not values:
+        return None
+    rank = math.ceil(fraction * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class ClientDriver:
+    """
+    Отправляет запросы тестовым клиентом Django в этом процессе.
+
+    У каждого потока свой клиент и своё соединение с базой, запросы к
+    которому считаются через execute_wrapper.
+    """
+
+    def __init__(self, user=None):
+        self.user = user
+        self.local = threading.local()
+
+    def client(self):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client()
+            if self.user is not None:
+                client.force_login(self.user)
+        return client
+
+    def get(self, path):
+        recording = Recording()
+        with connection.execute_wrapper(recording):
+            status = self.client().get(path).status_code
+        return status, len(recording.queries)
+
+
+class ServerDriver:
+    """Отправляет запросы на запущенный сервер, сессия берётся из базы."""
+
+    def __init__(self, base_url, user=None):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {}
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+            self.headers['Cookie'] = '{}={}'.format(
+                settings.SESSION_COOKIE_NAME, cookie.value
+            )
+
+    def get(self, path):
+        request = Request(self.base_url + path, headers=self.headers)
+        try:
+            with urlopen(request) as response:
+                response.read()
+                return response.status, None
+        except HTTPError as error:
+            return error.code, None
+
+
+def drive(driver, paths, concurrency, cold=False):
+    """
+    Прогоняет адреса через driver в concurrency потоков.
+
+    С cold кэш очищается перед каждым запросом; очистка в замер не
+    входит. Серверу это видно только при общем с ним кэше.
+
+    Возвращает сводку: перцентили задержки, среднее число запросов к
+    базе, ответы не 200 и пропускную способность.
+    """
+    def timed(path):
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        status, queries = driver.get(path)
+        return time.perf_counter() - started, status, queries
+
+    pending = iter(paths)
+    lock = threading.Lock()
+    results = []
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    path = next(pending, None)
+                if path is None:
+                    return
+                result = timed(path)
+                with lock:
+                    results.append(result)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        threads = [
+            threading.Thread(target=worker) for _ in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        results = [timed(path) for path in paths]
+    wall = time.perf_counter() - started
+    latencies = sorted(seconds * 1000 for seconds, _, _ in results)
+    queries = [count for _, _, count in results if count is not None]
+    return {
+        'requests': len(results),
+        'errors': sum(status != 200 for _, status, _ in results),
+        'mean_ms': sum(latencies) / len(latencies) if latencies else None,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'queries': sum(queries) / len(queries) if queries else None,
+        'rps': len(results) / wall if wall else None,
+    }
+
+
+def feed_extremes(followers, following, celebrities, posts_per_author,
+                  batch_size=5000):
+    """
+    Данные для сравнения стратегий ленты подписок на двух крайностях.
+
+    celebrities знаменитостей, у каждой followers подписчиков, и
+    читатель, подписанный на following обычных авторов и на всех
+    знаменитостей. У каждого автора posts_per_author постов. Сигналы
+    при bulk_create не срабатывают: счётчики подписчиков пишутся сразу,
+    «входящие» заполняет fill_inbox.
+
+    Возвращает id читателя и список id знаменитостей.
+    """
+    names = {
+        'star': celebrities, 'fan': followers, 'author': following,
+        'reader': 1,
+    }
+    password = make_password(PASSWORD)
+    users = (
+        User(username='{}_{}{}'.format(FEED_PREFIX, kind, number),
+             password=password)
+        for kind, count in names.items() for number in range(count)
+    )
+    for chunk in batches(users, batch_size):
+        User.objects.bulk_create(chunk)
+    ids = {kind: [] for kind in names}
+    for pk, username in User.objects.filter(
+        username__startswith=FEED_PREFIX + '_'
+    ).order_by('pk').values_list('pk', 'username'):
+        ids[username[len(FEED_PREFIX) + 1:].rstrip('0123456789')].append(pk)
+    stars, authors = ids['star'], ids['author']
+    reader = ids['reader'][0]
+    counts = dict.fromkeys(stars, followers + 1)
+    counts.update(dict.fromkeys(authors, 1))
+    stats = (
+        UserStats(user_id=pk, follower_count=counts.get(pk, 0))
+        for pks in ids.values() for pk in pks
+    )
+    for chunk in batches(stats, batch_size):
+        UserStats.objects.bulk_create(chunk)
+    follow_rows = (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_ids in (
+            *((fan, stars) for fan in ids['fan']),
+            (reader, authors + stars),
+        )
+        for author_id in author_ids
+    )
+    for chunk in batches(follow_rows, batch_size):
+        Follow.objects.bulk_create(chunk)
+    writers = authors + stars
+    now = timezone.now()
+    with keep_timestamps(Post):
+        for chunk in batches(range(len(writers) * posts_per_author),
+                             batch_size):
+            Post.objects.bulk_create(
+                Post(
+                    author_id=writers[number % len(writers)],
+                    text='Пост {}'.format(number),
+                    pub_date=now - timedelta(minutes=number),
+                    updated=now - timedelta(minutes=number),
+                )
+                for number in chunk
+            )
+    return reader, stars
+
+
+def fill_inbox(user_id, batch_size=5000):
+    """
+    Заполняет «входящие» пользователя заново, как после rebuild_feeds.
+
+    Посты знаменитостей по текущему FEED_CELEBRITY_FOLLOWERS не
+    попадают во «входящие». Возвращает число записей.
+    """
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    posts = Post.objects.filter(author_id__in=Follow.objects.filter(
+        user_id=user_id
+    ).values('author_id'))
+    threshold = settings.FEED_CELEBRITY_FOLLOWERS
+    if threshold:
+        posts = posts.exclude(author__stats__follower_count__gte=threshold)
+    entries = (
+        FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.values_list('pk', 'pub_date').iterator()
+    )
+    for chunk in batches(entries, batch_size):
+        FeedEntry.objects.bulk_create(chunk)
+    return FeedEntry.objects.filter(user_id=user_id).count()
+
+
+def measure(action, repeat):
+    """
+    Медиана времени action в мс и число запросов к базе за вызов.
+
+    Первый вызов прогревочный и в замер не входит.
+    """
+    action()
+    timings = []
+    for _ in range(repeat):
+        recording = Recording()
+        with connection.execute_wrapper(recording):
+            started = time.perf_counter()
+            action()
+            timings.append((time.perf_counter() - started) * 1000)
+    return percentile(sorted(timings), 0.5), len(recording.queries)
+
+
+# Стратегии ленты: порог FEED_CELEBRITY_FOLLOWERS (None — взять
+# переданный) и откуда читается лента. С порогом 1 посты не
+# раскладываются никому, лента «pull» читается одним запросом по всем
+# подпискам.
+FEED_STRATEGIES = {
+    'push': (0, 'merged'),
+    'pull': (1, 'pull'),
+    'hybrid': (None, 'merged'),
+}
+
+
+def compare_feeds(reader_id, star_id, threshold, pages=5, repeat=5,
+                  per_page=None):
+    """
+    Сравнивает стратегии ленты подписок на данных feed_extremes.
+
+    Для каждой стратегии замеряет публикацию поста знаменитостью (время,
+    запросы, записи во «входящие») и чтение pages страниц ленты
+    читателем (время и запросы на страницу). Публикации откатываются.
+    """
+    per_page = per_page or settings.PER_PAGE_COUNT
+    reader = User.objects.get(pk=reader_id)
+    results = {}
+    for name, (strategy_threshold, source) in FEED_STRATEGIES.items():
+        if strategy_threshold is None:
+            strategy_threshold = threshold
+        with override_settings(FEED_CELEBRITY_FOLLOWERS=strategy_threshold):
+            feeds.forget_celebrities()
+            graph.reset()
+            inbox_rows = fill_inbox(reader_id)
+            pushed, walked = [], []
+
+            def publish():
+                with transaction.atomic():
+                    post = Post.objects.create(
+                        author_id=star_id, text='Новый пост'
+                    )
+                    pushed.append(
+                        FeedEntry.objects.filter(post=post).count()
+                    )
+                    transaction.set_rollback(True)
+
+            def paginator(after):
+                if source == 'pull':
+                    return CursorPaginator(
+                        feeds.pull_feed(reader), per_page, after=after
+                    )
+                return MergedCursorPaginator(
+                    feeds.feed_sources(reader), per_page, after=after
+                )
+
+            def read():
+                after = None
+                for number in range(1, pages + 1):
+                    page_paginator = paginator(after)
+                    page = page_paginator.get_page()
+                    if not page.has_next():
+                        break
+                    after = page_paginator.next_cursor
+                walked.append(number)
+
+            write_ms, write_queries = measure(publish, repeat)
+            read_ms, read_queries = measure(read, repeat)
+        results[name] = {
+            'threshold': strategy_threshold,
+            'inbox_rows': inbox_rows,
+            'write_ms': write_ms,
+            'write_queries': write_queries,
+            'fan_out': pushed[-1],
+            'read_ms': read_ms / walked[-1],
+            'read_queries': read_queries / walked[-1],
+        }
+    return results
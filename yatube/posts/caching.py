@@ -0,0 +1,232 @@
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from core.profiling import record_cache
+from core.templatetags.user_parts import punch_holes, stitch
+
+INDEX = 'index'
+# Области данных автора и группы, которые показывает карточка поста.
+AUTHOR_CARD = 'author_card'
+GROUP_CARD = 'group_card'
+VERSION_KEY = 'version:{}'
+LOCK_TIMEOUT = 30
+LOCK_POLL_INTERVAL = 0.05
+
+
+def scope(name, pk):
+    """Имя области кэша для конкретного объекта: group:1, post:5."""
+    return '{}:{}'.format(name, pk)
+
+
+def _new_token():
+    """Токен версии: время выдачи в hex и случайная часть."""
+    return '{:x}-{}'.format(int(time.time()), uuid.uuid4().hex)
+
+
+def get_versions(scopes):
+    """
+    Версии областей по отдельности: {область: токен}.
+
+    Все версии читаются одним get_many; недостающие выдаются заново.
+    """
+    keys = {name: VERSION_KEY.format(name) for name in scopes}
+    found = cache.get_many(list(keys.values()))
+    versions = {}
+    for name, key in keys.items():
+        if key not in found:
+            token = _new_token()
+            if not cache.add(key, token, None):
+                token = cache.get(key, token)
+            found[key] = token
+        versions[name] = found[key]
+    return versions
+
+
+def get_version(*scopes):
+    """
+    Возвращает общую версию для набора областей.
+
+    Версия — случайный токен, а не счётчик: если ключ версии вытеснен
+    из кэша, новый токен не совпадёт ни с одним старым ключом страницы.
+    """
+    versions = get_versions(scopes)
+    return '.'.join(versions[name] for name in scopes)
+
+
+def invalidate(*scopes):
+    """Сбрасывает кэш областей, выдавая им новые версии."""
+    if scopes:
+        cache.set_many(
+            {VERSION_KEY.format(name): _new_token() for name in scopes},
+            None
+        )
+
+
+def version_modified(version):
+    """
+    Время последнего изменения областей по их версии или None.
+
+    Берётся из токенов, так что не требует запросов. Если ключ версии
+    вытеснен, время выдачи нового токена позже настоящего изменения:
+    клиент просто получит страницу заново.
+    """
+    stamps = [
+        int(token.split('-')[0], 16)
+        for token in version.split('.') if '-' in token
+    ]
+    if stamps:
+        return datetime.fromtimestamp(max(stamps), tz=timezone.utc)
+    return None
+
+
+def condition_versioned(scopes, vary_on_user=False):
+    """
+    Условный GET по версиям областей кэша.
+
+    ETag — хеш версий и адреса, Last-Modified — время последнего
+    сброса областей. Если клиент прислал совпадающий If-None-Match или
+    If-Modified-Since, Django отвечает 304, не вызывая вьюху. С
+    vary_on_user в ETag входит id пользователя, для страниц, которые
+    отличаются у разных посетителей.
+    """
+    def version(request, *args, **kwargs):
+        if not hasattr(request, 'condition_version'):
+            request.condition_version = get_version(
+                *scopes(request, *args, **kwargs)
+            )
+        return request.condition_version
+
+    def etag(request, *args, **kwargs):
+        parts = [version(request, *args, **kwargs), request.get_full_path()]
+        if vary_on_user:
+            parts.append(str(request.user.pk))
+        return md5(':'.join(parts).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return version_modified(version(request, *args, **kwargs))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def cache_context(*scopes):
+    """Переменные для {% cache %} в шаблонах: таймаут и версия."""
+    return {
+        'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+        'cache_version': get_version(*scopes),
+    }
+
+
+def _regenerate(key, compute, timeout, should_cache):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    if should_cache(value):
+        cache.set(
+            key,
+            (value, time.time() + timeout, delta),
+            timeout + settings.PAGE_CACHE_STALE_TIMEOUT
+        )
+    return value
+
+
+def get_or_regenerate(key, compute, timeout, should_cache=lambda value: True,
+                      beta=1.0):
+    """
+    Достаёт значение из кэша, защищая от одновременной перегенерации.
+
+    Запись живёт дольше своего срока на PAGE_CACHE_STALE_TIMEOUT: пока
+    один процесс под блокировкой пересчитывает значение, остальные
+    получают устаревшее. Срок проверяется с вероятностным досрочным
+    истечением (XFetch): чем дольше пересчёт, тем раньше он начнётся.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires, delta = entry
+        early = delta * beta * math.log(1 - random.random())
+        if time.time() - early < expires:
+            record_cache(hit=True)
+            return value
+    record_cache(hit=False)
+    lock_key = key + ':lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return _regenerate(key, compute, timeout, should_cache)
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        return entry[0]
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if cache.get(lock_key) is None:
+            break
+    return compute()
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming
+
+
+def cache_response_versioned(scopes, timeout=None):
+    """
+    Кэширует GET-ответ вьюхи под ключом с версиями областей.
+
+    scopes(request, *args, **kwargs) возвращает области, от которых
+    зависит ответ; сигналы сбрасывают их при изменении данных,
+    поэтому таймаут может быть большим. Перегенерация идёт через
+    get_or_regenerate, то есть одним процессом за раз. Ответ
+    кэшируется целиком, как есть: так кэшируется JSON API.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = 'page:{}:{}'.format(
+                get_version(*scopes(request, *args, **kwargs)),
+                md5(request.get_full_path().encode()).hexdigest(),
+            )
+            return get_or_regenerate(
+                key,
+                lambda: view(request, *args, **kwargs),
+                timeout or settings.PAGE_CACHE_TIMEOUT,
+                should_cache=_cacheable,
+            )
+        return wrapper
+    return decorator
+
+
+def cache_page_versioned(scopes, timeout=None):
+    """
+    Кэширует HTML-страницу так же, как cache_response_versioned.
+
+    В кэш попадает страница без частей, зависящих от пользователя
+    (см. core.templatetags.user_parts): они подставляются при каждой
+    отдаче, поэтому кэш общий для анонимов и авторизованных.
+    """
+    def decorator(view):
+        cached = cache_response_versioned(scopes, timeout)(
+            lambda request, *args, **kwargs: punch_holes(
+                view, request, *args, **kwargs
+            )
+        )
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            return stitch(request, cached(request, *args, **kwargs))
+        return wrapper
+    return decorator
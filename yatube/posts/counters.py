@@ -0,0 +1,57 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def bump(queryset, field, delta):
+    """Атомарно меняет счётчик, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{field + '__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def _count(model, field, outer='pk', **filters):
+    """Подзапрос количества строк model, ссылающихся на внешнюю строку."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef(outer)}, **filters
+        ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def recount(user_model, stats_model, group_model, post_model,
+            comment_model, follow_model):
+    """
+    Пересчитывает все денормализованные счётчики по исходным таблицам.
+
+    Подписки без подписчика или автора не считаются, как и в сигналах.
+    """
+    existing = stats_model.objects.values('user_id')
+    stats_model.objects.bulk_create(
+        stats_model(user_id=pk)
+        for pk in user_model.objects.exclude(
+            pk__in=existing
+        ).values_list('pk', flat=True)
+    )
+    stats_model.objects.update(
+        post_count=_count(post_model, 'author', 'user'),
+        follower_count=_count(
+            follow_model, 'author', 'user', user__isnull=False
+        ),
+        following_count=_count(
+            follow_model, 'user', 'user', author__isnull=False
+        ),
+    )
+    group_model.objects.update(post_count=_count(post_model, 'group'))
+    post_model.objects.update(comment_count=_count(comment_model, 'post'))
+
+
+def recount_media(post_model, media_model):
+    """Пересчитывает ссылки постов на файлы картинок."""
+    existing = media_model.objects.values('name')
+    media_model.objects.bulk_create(
+        media_model(name=name)
+        for name in post_model.objects.exclude(image='').exclude(
+            image__in=existing
+        ).values_list('image', flat=True).distinct()
+    )
+    media_model.objects.update(refs=_count(post_model, 'image', 'name'))
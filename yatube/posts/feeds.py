@@ -0,0 +1,238 @@
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .caching import invalidate, scope
+from .graph import following_ids
+from .models import FeedEntry, Follow, Post, PostQuerySet, UserStats
+from .paginators import DEFAULT_KEY, get_merged_page
+
+BATCH_SIZE = 1000
+# Ключ курсорной пагинации «входящих»: дата поста и его id.
+INBOX_KEY = ('pub_date', 'post_id')
+# Область кэша всех лент подписок: сбрасывается при их пересборке.
+FEEDS = 'feeds'
+CELEBRITIES_KEY = 'feed_celebrities:{}'
+CELEBRITIES_TIMEOUT = 60
+
+
+def inbox(user):
+    """«Входящие» пользователя с постами, загруженными как для ленты."""
+    return FeedEntry.objects.filter(
+        user=user
+    ).select_related('post__author', 'post__group').only(
+        'pub_date', 'post', 'user',
+        *('post__' + field for field in PostQuerySet.FEED_FIELDS)
+    )
+
+
+def celebrity_ids():
+    """
+    id авторов, чьи посты не раскладываются по «входящим».
+
+    Это авторы с FEED_CELEBRITY_FOLLOWERS подписчиками и больше; их
+    посты подмешиваются в ленту при чтении. Множество кэшируется на
+    CELEBRITIES_TIMEOUT секунд. Пустое, если порог не задан.
+    """
+    threshold = settings.FEED_CELEBRITY_FOLLOWERS
+    if not threshold:
+        return frozenset()
+    key = CELEBRITIES_KEY.format(threshold)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(UserStats.objects.filter(
+            follower_count__gte=threshold
+        ).values_list('user_id', flat=True))
+        cache.set(key, ids, CELEBRITIES_TIMEOUT)
+    return ids
+
+
+def forget_celebrities():
+    """Сбрасывает закэшированное множество знаменитостей."""
+    cache.delete(CELEBRITIES_KEY.format(settings.FEED_CELEBRITY_FOLLOWERS))
+
+
+def is_celebrity(author_id):
+    return author_id in celebrity_ids()
+
+
+def followed_celebrities(user_id):
+    """Авторы-знаменитости, на которых подписан пользователь."""
+    return sorted(following_ids(user_id) & celebrity_ids())
+
+
+def feed_scopes(user_id):
+    """
+    Области кэша ленты подписок.
+
+    Посты знаменитостей не сбрасывают ленты подписчиков по одной, поэтому
+    лента зависит ещё и от профилей знаменитостей, на которых подписан
+    пользователь. Общая область FEEDS сбрасывает все ленты разом.
+    """
+    return (FEEDS, scope('feed', user_id), *(
+        scope('profile', author_id)
+        for author_id in followed_celebrities(user_id)
+    ))
+
+
+def feed_sources(user):
+    """
+    Источники ленты подписок для MergedCursorPaginator.
+
+    «Входящие» с постами обычных авторов и по источнику на каждую
+    знаменитость из подписок: её посты читаются по индексу
+    (author, -pub_date, -id).
+    """
+    return [(inbox(user), INBOX_KEY, attrgetter('post'))] + [
+        (Post.objects.for_feed().filter(author_id=author_id), DEFAULT_KEY,
+         None)
+        for author_id in followed_celebrities(user.pk)
+    ]
+
+
+def pull_feed(user):
+    """Посты всех авторов из подписок одним запросом, без «входящих»."""
+    return Post.objects.for_feed().filter(
+        author_id__in=following_ids(user.pk)
+    )
+
+
+def feed_page(request):
+    """Страница ленты подписок текущего пользователя; элементы — посты."""
+    return get_merged_page(
+        request, feed_sources(request.user), pull_feed(request.user)
+    )
+
+
+def batch_size():
+    """BATCH_SIZE, но не больше, чем база принимает в одном INSERT."""
+    return min(BATCH_SIZE, connection.ops.bulk_batch_size(
+        FeedEntry._meta.concrete_fields, [None] * BATCH_SIZE
+    ))
+
+
+def push_post(post):
+    """
+    Раскладывает новый пост во «входящие» подписчиков автора.
+
+    Посты знаменитостей не раскладываются: запись в тысячи «входящих»
+    на каждый пост дороже, чем подмешать их при чтении.
+    """
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=batch_size(),
+        ignore_conflicts=True,
+    )
+
+
+def backfill_inbox(user_id, author_id):
+    """Добавляет во «входящие» все посты автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts.iterator()
+        ),
+        batch_size=batch_size(),
+        ignore_conflicts=True,
+    )
+
+
+def prune_inbox(user_id, author_id):
+    """Убирает посты автора из «входящих» после отписки."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def _fill_inboxes(condition='', params=()):
+    """
+    Вставляет записи «входящих» одним INSERT ... SELECT из подписок и
+    постов; condition дописывается к WHERE и может ссылаться на те же
+    имена таблиц и колонок.
+    """
+    qn = connection.ops.quote_name
+    sql = (
+        'INSERT INTO {entry} ({user}, {post}, {date}) '
+        'SELECT f.{follower}, p.{pk}, p.{pub_date} '
+        'FROM {follow} f JOIN {posts} p ON p.{author} = f.{followed} '
+        'WHERE f.{follower} IS NOT NULL' + condition
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            entry=qn(FeedEntry._meta.db_table),
+            user=qn(FeedEntry._meta.get_field('user').column),
+            post=qn(FeedEntry._meta.get_field('post').column),
+            date=qn(FeedEntry._meta.get_field('pub_date').column),
+            follow=qn(Follow._meta.db_table),
+            follower=qn(Follow._meta.get_field('user').column),
+            followed=qn(Follow._meta.get_field('author').column),
+            posts=qn(Post._meta.db_table),
+            pk=qn(Post._meta.pk.column),
+            pub_date=qn(Post._meta.get_field('pub_date').column),
+            author=qn(Post._meta.get_field('author').column),
+            stats=qn(UserStats._meta.db_table),
+            stats_user=qn(UserStats._meta.get_field('user').column),
+            follower_count=qn(
+                UserStats._meta.get_field('follower_count').column
+            ),
+        ), list(params))
+
+
+def author_demoted(author_id):
+    """
+    Раскладывает посты автора, если он опустился ниже порога знаменитости.
+
+    Вызывается после отписки от автора, который до неё считался
+    знаменитостью. Его посты того времени никуда не раскладывались и
+    после потери статуса перестали бы подмешиваться в ленты, поэтому они
+    добавляются во «входящие» всех подписчиков (кроме уже лежащих там).
+    """
+    if UserStats.objects.filter(
+        user_id=author_id,
+        follower_count__lt=settings.FEED_CELEBRITY_FOLLOWERS,
+    ).exists():
+        forget_celebrities()
+        _fill_inboxes(
+            ' AND f.{followed} = %s AND NOT EXISTS (SELECT 1 FROM {entry} e '
+            'WHERE e.{user} = f.{follower} AND e.{post} = p.{pk})',
+            [author_id],
+        )
+
+
+def rebuild_inboxes():
+    """
+    Пересобирает «входящие» всех пользователей с нуля.
+
+    Записи вставляются одним INSERT ... SELECT из подписок и постов, без
+    объектов моделей в Python: на больших графах подписок это на порядки
+    быстрее, чем backfill_inbox для каждой подписки. Посты знаменитостей
+    пропускаются, как и в push_post. Закэшированные ленты сбрасываются.
+    """
+    FeedEntry.objects.all().delete()
+    forget_celebrities()
+    threshold = settings.FEED_CELEBRITY_FOLLOWERS
+    if threshold:
+        _fill_inboxes(
+            ' AND f.{followed} NOT IN (SELECT {stats_user} FROM {stats} '
+            'WHERE {follower_count} >= %s)',
+            [threshold],
+        )
+    else:
+        _fill_inboxes()
+    invalidate(FEEDS)
+    return Follow.objects.exclude(user=None).exclude(author=None).count()
@@ -1,9 +1,22 @@
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
-from .models import Comment, Post
+from .models import Comment, Group, Post, User
+from .uploads import normalize_image, open_image
 
 
 class PostForm(forms.ModelForm):
+    """
+    Форма поста с ограничениями на картинку.
+
+    Размер файла проверяется до того, как Pillow его откроет, число
+    пикселей — по заголовку, до декодирования. Принятая картинка
+    пересохраняется уменьшенной и без метаданных.
+    """
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
@@ -18,8 +31,64 @@ class PostForm(forms.ModelForm):
             'image': 'Добавь картинку',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.image_too_large = False
+        image = self.files.get('image')
+        if image is not None and image.size > settings.POST_IMAGE_MAX_BYTES:
+            self.files = self.files.copy()
+            self.files.pop('image')
+            self.image_too_large = True
+
+    def clean_image(self):
+        if self.image_too_large:
+            raise ValidationError(
+                'Файл больше %(limit)s.',
+                code='too_large',
+                params={
+                    'limit': filesizeformat(settings.POST_IMAGE_MAX_BYTES)
+                },
+            )
+        upload = self.cleaned_data['image']
+        if not isinstance(upload, UploadedFile):
+            return upload
+        with open_image(upload) as image:
+            width, height = image.size
+            if width * height > settings.POST_IMAGE_MAX_PIXELS:
+                raise ValidationError(
+                    'Картинка больше %(limit)s мегапикселей.',
+                    code='too_many_pixels',
+                    params={
+                        'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6
+                    },
+                )
+            try:
+                return normalize_image(upload, image)
+            except Exception as exc:
+                raise ValidationError(
+                    self.fields['image'].error_messages['invalid_image'],
+                    code='invalid_image',
+                ) from exc
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ['text']
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Запрос', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        label='Группа',
+        to_field_name='slug',
+        required=False,
+    )
+    author = forms.ModelChoiceField(
+        User.objects.all(),
+        label='Автор',
+        to_field_name='username',
+        required=False,
+        widget=forms.TextInput,
+    )
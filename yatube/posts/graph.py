@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import get_version, invalidate
+from .models import Follow
+
+GRAPH = 'follow_graph'
+KEY = 'follow_graph:{}:{}:{}'
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+# Какое поле Follow хранит владельца множества и какое — его элементы.
+FIELDS = {
+    FOLLOWING: ('user_id', 'author_id'),
+    FOLLOWERS: ('author_id', 'user_id'),
+}
+
+
+def _key(kind, user_id):
+    return KEY.format(get_version(GRAPH), kind, user_id)
+
+
+def _load(kind, user_id):
+    owner, member = FIELDS[kind]
+    return frozenset(
+        Follow.objects.filter(**{owner: user_id}).exclude(
+            **{member: None}
+        ).values_list(member, flat=True)
+    )
+
+
+def _ids(kind, user_id):
+    """Множество id из кэша; при промахе читается из базы и кэшируется."""
+    if user_id is None:
+        return frozenset()
+    key = _key(kind, user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = _load(kind, user_id)
+        cache.set(key, ids, settings.FOLLOW_GRAPH_TIMEOUT)
+    return ids
+
+
+def following_ids(user_id):
+    """id авторов, на которых подписан пользователь."""
+    return _ids(FOLLOWING, user_id)
+
+
+def follower_ids(user_id):
+    """id подписчиков пользователя."""
+    return _ids(FOLLOWERS, user_id)
+
+
+def is_following(user_id, author_id):
+    """Подписан ли пользователь на автора: проверка по множеству в кэше."""
+    return author_id in following_ids(user_id)
+
+
+def following_among(user_id, author_ids):
+    """
+    На кого из author_ids подписан пользователь.
+
+    Одно обращение к кэшу на всю страницу авторов вместо запроса на
+    каждого.
+    """
+    return following_ids(user_id).intersection(author_ids)
+
+
+def _update(kind, user_id, member_id, add):
+    """
+    Меняет закэшированное множество, если оно уже загружено.
+
+    Незагруженное множество не трогается: его прочитают из базы при
+    первом обращении. Одновременные правки одного множества могут
+    потерять изменение, поэтому у ключей есть срок FOLLOW_GRAPH_TIMEOUT.
+    """
+    key = _key(kind, user_id)
+    ids = cache.get(key)
+    if ids is not None:
+        ids = ids | {member_id} if add else ids - {member_id}
+        cache.set(key, ids, settings.FOLLOW_GRAPH_TIMEOUT)
+
+
+def follow_changed(user_id, author_id, followed):
+    """Обновляет множества обеих сторон после подписки или отписки."""
+    if user_id and author_id:
+        _update(FOLLOWING, user_id, author_id, followed)
+        _update(FOLLOWERS, author_id, user_id, followed)
+
+
+def reset():
+    """Сбрасывает весь граф, например после загрузки подписок пачкой."""
+    invalidate(GRAPH)
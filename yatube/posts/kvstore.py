@@ -0,0 +1,39 @@
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(CachedDBStore):
+    """
+    KV-хранилище sorl в общем кэше с пакетным чтением.
+
+    Как и cached_db, держит записи в кэше THUMBNAIL_CACHE и в таблице
+    sorl, но умеет достать записи сразу для всей страницы: один get_many
+    к кэшу и не больше одного запроса к базе для промахов.
+    """
+
+    def get_many(self, image_files):
+        """Словарь {ключ ImageFile: ImageFile или None}."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self.cache.get_many(list(keys))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(KVStoreModel.objects.filter(
+                key__in=missing
+            ).values_list('key', 'value'))
+            loaded = {key: found.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                loaded, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(loaded)
+        return {
+            image_key: (
+                None if values[key] == EMPTY_VALUE
+                else deserialize_image_file(values[key])
+            )
+            for key, image_key in keys.items()
+        }
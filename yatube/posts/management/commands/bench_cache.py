@@ -0,0 +1,55 @@
+import random
+import uuid
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает долю попаданий в кэш у нескольких воркеров: '
+        'у каждого свой LocMemCache против общего бэкенда.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=100)
+        parser.add_argument('--alias', default='default')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def simulate(self, worker_caches, keys, version):
+        """Прогоняет запросы по воркерам по кругу и считает попадания."""
+        hits = 0
+        for number, key in enumerate(keys):
+            cache = worker_caches[number % len(worker_caches)]
+            if cache.get(key, version=version) is not None:
+                hits += 1
+            else:
+                cache.set(key, 'page', version=version)
+        return hits / len(keys)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        keys = [
+            'bench:page:{}'.format(
+                int(rnd.paretovariate(1.2)) % options['keys']
+            )
+            for _ in range(options['requests'])
+        ]
+        version = uuid.uuid4().hex
+        local = [
+            LocMemCache('bench-worker-{}'.format(i), {})
+            for i in range(options['workers'])
+        ]
+        shared = [caches[options['alias']]] * options['workers']
+        results = (
+            ('per-worker locmem', self.simulate(local, keys, version)),
+            (
+                'shared ({})'.format(options['alias']),
+                self.simulate(shared, keys, version),
+            ),
+        )
+        for name, hit_rate in results:
+            self.stdout.write('{:<24} hit rate {:.1%}'.format(name, hit_rate))
@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts.benchmark import compare_feeds, current_commit, feed_extremes
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стратегии ленты подписок (push, pull, hybrid) на двух '
+        'крайностях: знаменитость с тысячами подписчиков публикует пост, '
+        'читатель с тысячами подписок листает ленту. Данные создаются во '
+        'временной транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=5000)
+        parser.add_argument('--following', type=int, default=2000)
+        parser.add_argument('--celebrities', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=5)
+        parser.add_argument(
+            '--threshold', type=int,
+            help='Порог FEED_CELEBRITY_FOLLOWERS для hybrid; по умолчанию '
+                 'равен --followers.'
+        )
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='Куда записать результаты.')
+
+    def handle(self, *args, **options):
+        threshold = options['threshold'] or options['followers']
+        with transaction.atomic():
+            reader, stars = feed_extremes(
+                options['followers'], options['following'],
+                options['celebrities'], options['posts'],
+            )
+            strategies = compare_feeds(
+                reader, stars[0], threshold,
+                pages=options['pages'], repeat=options['repeat'],
+            )
+            transaction.set_rollback(True)
+        self.stdout.write(
+            '{:<8} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9}'.format(
+                'strategy', 'write ms', 'write sql', 'fan-out', 'inbox',
+                'page ms', 'page sql',
+            )
+        )
+        for name, summary in strategies.items():
+            self.stdout.write(
+                '{:<8} {:>9.1f} {:>9} {:>9} {:>9} {:>9.1f} {:>9.1f}'.format(
+                    name, summary['write_ms'], summary['write_queries'],
+                    summary['fan_out'], summary['inbox_rows'],
+                    summary['read_ms'], summary['read_queries'],
+                )
+            )
+        if options['output']:
+            results = {
+                'commit': current_commit(),
+                'started': timezone.now().isoformat(),
+                'options': {
+                    name: options[name] for name in (
+                        'followers', 'following', 'celebrities', 'posts',
+                        'pages', 'repeat',
+                    )
+                },
+                'threshold': threshold,
+                'strategies': strategies,
+            }
+            with open(options['output'], 'w') as stream:
+                json.dump(results, stream, indent=2)
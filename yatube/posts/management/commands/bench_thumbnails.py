@@ -0,0 +1,66 @@
+import uuid
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.functional import empty
+from sorl.thumbnail import default
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+KVSTORE_TABLE = KVStoreModel._meta.db_table
+
+
+@contextmanager
+def fresh_kvstore():
+    """
+    Пересоздаёт KV-хранилище sorl с пустым кэшем.
+
+    Хранилище создаётся один раз на процесс и может держать кэш, взятый
+    ещё до override_settings: тогда второй замер попал бы в записи,
+    прогретые первым.
+    """
+    saved = default.kvstore._wrapped
+    default.kvstore._wrapped = empty
+    try:
+        default.kvstore.cache.clear()
+        yield
+    finally:
+        default.kvstore._wrapped = saved
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает запросы к таблице миниатюр на страницах ленты '
+        'с пакетной загрузкой миниатюр и без неё.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*', default=['/'],
+            help='Адреса страниц, по умолчанию главная.'
+        )
+
+    def measure(self, path, prefetch):
+        """Запросы к KV-хранилищу при рендере страницы с холодным кэшем."""
+        caches = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bench-thumbnails-{}'.format(uuid.uuid4().hex),
+        }}
+        with override_settings(CACHES=caches, THUMBNAIL_PREFETCH=prefetch), \
+                fresh_kvstore():
+            with CaptureQueriesContext(connection) as queries:
+                Client().get(path)
+        return sum(
+            KVSTORE_TABLE in query['sql'] for query in queries.captured_queries
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('{:<32} {:>8} {:>8}'.format(
+            'page', 'per-post', 'batched'
+        ))
+        for path in options['paths']:
+            self.stdout.write('{:<32} {:>8} {:>8}'.format(
+                path, self.measure(path, False), self.measure(path, True)
+            ))
@@ -0,0 +1,121 @@
+import inspect
+import shutil
+import tempfile
+import tracemalloc
+import uuid
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.forms import modelform_factory
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import views
+from posts.models import Post, User
+from posts.thumbnails import generate_thumbnails
+
+
+def read_status(field):
+    """Значение поля /proc/self/status в байтах."""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+    raise OSError('Нет поля {} в /proc/self/status'.format(field))
+
+
+def reset_peak_rss():
+    """Сбрасывает VmHWM до текущего RSS (Linux 4.0+)."""
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+
+
+class Command(BaseCommand):
+    help = (
+        'Пиковая память воркера при загрузке большой картинки через '
+        'post_create: со штатной обработкой загрузок и с потоковой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=8000)
+        parser.add_argument('--height', type=int, default=6000)
+
+    def make_upload(self, width, height):
+        image = Image.radial_gradient('L').resize((width, height))
+        buffer = BytesIO()
+        Image.merge('RGB', (image, image.rotate(90), image)).save(
+            buffer, 'JPEG', quality=95
+        )
+        return buffer.getvalue()
+
+    def measure(self, content, stock):
+        """Пики памяти при загрузке и при генерации вариантов картинки."""
+        media_root = tempfile.mkdtemp()
+        caches = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bench-uploads-{}'.format(uuid.uuid4().hex),
+        }}
+        overrides = {'MEDIA_ROOT': media_root, 'CACHES': caches}
+        form_class = (
+            modelform_factory(Post, fields=('text', 'group', 'image'))
+            if stock else views.PostForm
+        )
+        # Без limit_uploads загрузка идёт штатными обработчиками Django.
+        view = inspect.unwrap(views.post_create) if stock \
+            else views.post_create
+        try:
+            with override_settings(**overrides), transaction.atomic():
+                request = RequestFactory().post(
+                    reverse('posts:post_create'),
+                    data={
+                        'text': 'Большая картинка',
+                        'image': SimpleUploadedFile(
+                            'large.jpg', content, content_type='image/jpeg'
+                        ),
+                    },
+                )
+                request._dont_enforce_csrf_checks = True
+                request.user = User.objects.create_user(
+                    username='bench-{}'.format(uuid.uuid4().hex[:8])
+                )
+                with mock.patch.object(views, 'PostForm', form_class):
+                    upload_peak = self.peak(view, request)
+                post = Post.objects.get(author=request.user)
+                variants_peak = self.peak(generate_thumbnails, post.pk)
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+        return upload_peak + variants_peak
+
+    def peak(self, func, *args):
+        """Прирост пикового RSS и пик аллокаций Python за вызов func."""
+        reset_peak_rss()
+        start = read_status('VmRSS')
+        tracemalloc.start()
+        func(*args)
+        python_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return read_status('VmHWM') - start, python_peak
+
+    def handle(self, *args, **options):
+        content = self.make_upload(options['width'], options['height'])
+        self.stdout.write('Картинка {}x{}, {:.1f} МБ'.format(
+            options['width'], options['height'], len(content) / 1024 ** 2
+        ))
+        self.stdout.write(
+            'Пики в МБ: RSS и аллокации Python, при загрузке '
+            'и при генерации вариантов.'
+        )
+        row = '{:<12}' + ' {:>10}' * 4
+        self.stdout.write(row.format(
+            '', 'upload RSS', 'upload Py', 'variants', 'vars Py'
+        ))
+        for name, stock in (('stock', True), ('streaming', False)):
+            self.stdout.write(row.format(name, *(
+                '{:.1f}'.format(value / 1024 ** 2)
+                for value in self.measure(content, stock)
+            )))
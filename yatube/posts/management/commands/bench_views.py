@@ -0,0 +1,161 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.benchmark import (
+    PREFIX, WORDS, ClientDriver, ServerDriver, current_commit, dataset, drive,
+    popularity,
+)
+from posts.models import Group, Post, User
+
+VIEWS = (
+    'index', 'follow_index', 'profile', 'post_detail', 'group_list',
+    'post_search',
+)
+COMPARED = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'rps')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон вьюх: перцентили задержки, запросы к базе на '
+        'запрос и пропускная способность, с записью результатов в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--views', nargs='+', choices=VIEWS, default=list(VIEWS)
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument(
+            '--server',
+            help='Адрес запущенного сервера, например http://127.0.0.1:8000;'
+                 ' без него запросы идут тестовым клиентом в этом процессе.'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument('--output', help='Куда записать результаты.')
+        parser.add_argument(
+            '--compare', help='Результаты прошлого прогона для сравнения.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def paths(self, view, count, rnd):
+        """Адреса для вьюхи: популярные авторы чаще, посты равномерно."""
+        if view in ('index', 'follow_index'):
+            return [reverse('posts:' + view)] * count
+        if view == 'post_search':
+            return [
+                '{}?q={}'.format(reverse('posts:post_search'), word)
+                for word in rnd.choices(WORDS, k=count)
+            ]
+        if view == 'group_list':
+            slugs = list(Group.objects.values_list('slug', flat=True))
+            return [
+                reverse('posts:group_list', args=[slug])
+                for slug in rnd.choices(slugs, k=count)
+            ] if slugs else []
+        if view == 'profile':
+            names = list(User.objects.filter(
+                username__startswith=PREFIX
+            ).order_by('pk').values_list('username', flat=True)[:10000])
+            return [
+                reverse('posts:profile', args=[name])
+                for name in rnd.choices(
+                    names, cum_weights=popularity(len(names)), k=count
+                )
+            ] if names else []
+        bounds = Post.objects.order_by('pk').values_list('pk', flat=True)
+        first, last = bounds.first(), bounds.last()
+        return [
+            reverse('posts:post_detail', args=[rnd.randint(first, last)])
+            for _ in range(count)
+        ] if first is not None else []
+
+    def reader(self):
+        """Пользователь для ленты подписок: подписанный на больше всех."""
+        user = User.objects.filter(
+            stats__following_count__gt=0
+        ).order_by('-stats__following_count').first()
+        if user is None:
+            raise CommandError('Нет подписок: сначала запустите seed_bench')
+        return user
+
+    def driver(self, options, user=None):
+        if options['server']:
+            return ServerDriver(options['server'], user)
+        return ClientDriver(user)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        results = {
+            'commit': current_commit(),
+            'started': timezone.now().isoformat(),
+            'mode': 'server' if options['server'] else 'client',
+            'concurrency': options['concurrency'],
+            'cold': options['cold'],
+            'dataset': dataset(),
+            'views': {},
+        }
+        anonymous = self.driver(options)
+        self.stdout.write(
+            '{:<14} {:>6} {:>6} {:>8} {:>8} {:>8} {:>7} {:>8}'.format(
+                'view', 'reqs', 'errors', 'p50 ms', 'p95 ms', 'p99 ms',
+                'sql', 'rps',
+            )
+        )
+        for view in options['views']:
+            driver = anonymous
+            if view == 'follow_index':
+                driver = self.driver(options, self.reader())
+            paths = self.paths(
+                view, options['warmup'] + options['requests'], rnd
+            )
+            if not paths:
+                self.stderr.write('{}: нет данных, пропущено'.format(view))
+                continue
+            drive(driver, paths[:options['warmup']], options['concurrency'])
+            summary = drive(
+                driver, paths[options['warmup']:], options['concurrency'],
+                cold=options['cold'],
+            )
+            results['views'][view] = summary
+            self.stdout.write(
+                '{:<14} {:>6} {:>6} {:>8.1f} {:>8.1f} {:>8.1f} {:>7} '
+                '{:>8.1f}'.format(
+                    view, summary['requests'], summary['errors'],
+                    summary['p50_ms'], summary['p95_ms'], summary['p99_ms'],
+                    '-' if summary['queries'] is None
+                    else '{:.1f}'.format(summary['queries']),
+                    summary['rps'],
+                )
+            )
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(results, stream, indent=2)
+        if options['compare']:
+            with open(options['compare']) as stream:
+                self.compare(json.load(stream), results)
+
+    def compare(self, before, after):
+        """Изменение метрик относительно прошлого прогона в процентах."""
+        self.stdout.write('\nСравнение с {}:'.format(
+            before.get('commit') or 'прошлым прогоном'
+        ))
+        for view, summary in after['views'].items():
+            old = before.get('views', {}).get(view)
+            if old is None:
+                continue
+            changes = []
+            for metric in COMPARED:
+                if old.get(metric) and summary.get(metric) is not None:
+                    changes.append('{} {:+.0%}'.format(
+                        metric, summary[metric] / old[metric] - 1
+                    ))
+            self.stdout.write('{:<14} {}'.format(view, ', '.join(changes)))
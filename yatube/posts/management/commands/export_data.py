@@ -0,0 +1,37 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import FORMATS, TABLES, Progress, export_table, file_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в JSON Lines '
+        'или CSV, по файлу на таблицу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--progress-every', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        os.makedirs(options['directory'], exist_ok=True)
+        for table, model, fields in TABLES:
+            path = os.path.join(
+                options['directory'], file_name(table, options['format'])
+            )
+            progress = Progress(
+                self.stdout.write, table, options['progress_every']
+            )
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                export_table(
+                    stream, model, fields, options['format'],
+                    options['chunk_size'], progress,
+                )
+            progress.done()
+        self.stdout.write(self.style.SUCCESS(
+            'Выгрузка сохранена в {}'.format(options['directory'])
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.media import collect_orphans
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок, на которые не ссылается ни один пост, '
+        'вместе с их вариантами.'
+    )
+
+    def handle(self, *args, **options):
+        deleted = collect_orphans()
+        self.stdout.write(self.style.SUCCESS(
+            'Удалено файлов: {}'.format(deleted)
+        ))
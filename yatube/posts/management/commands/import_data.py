@@ -0,0 +1,57 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.transfer import (
+    FORMATS, TABLES, Progress, file_name, finish_import, import_table
+)
+
+SKIPPED = ', пропущено без пользователя или связанной строки: {}'
+CONFLICTS = ', пропущено из-за id, занятого другой записью: {}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_data пачками через bulk_create и '
+        'один раз пересчитывает счётчики, ленты и кэш.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--progress-every', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        paths = [
+            (table, model, fields, os.path.join(
+                options['directory'], file_name(table, options['format'])
+            ))
+            for table, model, fields in TABLES
+        ]
+        missing = [path for *_, path in paths if not os.path.exists(path)]
+        if missing:
+            raise CommandError('Нет файлов: {}'.format(', '.join(missing)))
+        touched = set()
+        dropped = {}
+        with transaction.atomic():
+            for table, model, fields, path in paths:
+                progress = Progress(
+                    self.stdout.write, table, options['progress_every']
+                )
+                with open(path, encoding='utf-8', newline='') as stream:
+                    skipped, conflicts = import_table(
+                        stream, model, fields, options['format'],
+                        options['batch_size'], progress, touched, dropped,
+                    )
+                progress.done(
+                    (SKIPPED.format(skipped) if skipped else '')
+                    + (CONFLICTS.format(conflicts) if conflicts else '')
+                )
+            follows = finish_import(touched)
+        self.stdout.write(self.style.SUCCESS(
+            'Загрузка завершена, лент пересобрано по {} подпискам'.format(
+                follows
+            )
+        ))
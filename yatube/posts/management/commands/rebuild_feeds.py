@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.feeds import rebuild_inboxes
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок всех пользователей с нуля.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            follows = rebuild_inboxes()
+        self.stdout.write(self.style.SUCCESS(
+            'Ленты пересобраны, подписок обработано: {}'.format(follows)
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount, recount_media
+from posts.models import (
+    Comment, Follow, Group, MediaFile, Post, User, UserStats
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов, комментариев, подписок '
+        'и ссылок на файлы картинок.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount(User, UserStats, Group, Post, Comment, Follow)
+            recount_media(Post, MediaFile)
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.benchmark import seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, постами, '
+        'комментариями и подписками для нагрузочных тестов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Подписок на пользователя, авторы выбираются по Ципфу.'
+        )
+        parser.add_argument(
+            '--comments', type=int, default=1,
+            help='Комментариев на пост в среднем.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seed(
+                options['users'], options['posts'],
+                groups=options['groups'],
+                follows=options['follows'],
+                comments=options['comments'],
+                batch_size=options['batch_size'],
+                rnd_seed=options['seed'],
+                write=self.stdout.write,
+            )
+        self.stdout.write(self.style.SUCCESS('База наполнена'))
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from .counters import bump
+from .models import MediaFile, Post
+
+
+def retain(name):
+    """Учитывает ещё одну ссылку поста на файл картинки."""
+    if not bump(MediaFile.objects.filter(name=name), 'refs', 1):
+        MediaFile.objects.get_or_create(name=name, defaults={'refs': 1})
+
+
+def release(name):
+    """Снимает ссылку на файл и после коммита пробует его удалить."""
+    bump(MediaFile.objects.filter(name=name), 'refs', -1)
+    transaction.on_commit(lambda: collect(name))
+
+
+def collect(name):
+    """
+    Удаляет файл без ссылок вместе с его вариантами.
+
+    Файлы моложе MEDIA_GC_GRACE не трогаются: такой файл мог только что
+    переиспользовать новый пост, ещё не сохранённый в базе. Их позже
+    удалит команда gc_media. Возвращает True, если файл удалён.
+    """
+    storage = Post._meta.get_field('image').storage
+    with transaction.atomic():
+        media = MediaFile.objects.select_for_update().filter(
+            name=name, refs=0
+        ).first()
+        if media is None:
+            return False
+        try:
+            modified = storage.get_modified_time(name)
+        except FileNotFoundError:
+            modified = None
+        except SuspiciousFileOperation:
+            # Путь вне MEDIA_ROOT: такой файл хранилищу не принадлежит.
+            media.delete()
+            return False
+        grace = timedelta(seconds=settings.MEDIA_GC_GRACE)
+        if modified is not None and timezone.now() - modified < grace:
+            return False
+        delete_with_thumbnails(ImageFile(name, storage))
+        media.delete()
+    return True
+
+
+def collect_orphans():
+    """Удаляет все файлы без ссылок; возвращает число удалённых."""
+    return sum(
+        collect(name)
+        for name in MediaFile.objects.filter(
+            refs=0
+        ).values_list('name', flat=True)
+    )
@@ -0,0 +1,75 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_inboxes(apps, schema_editor):
+    """Раскладывает существующие посты по «входящим» подписчиков."""
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    qn = schema_editor.quote_name
+    schema_editor.execute(
+        'INSERT INTO {entry} ({user}, {post}, {date}) '
+        'SELECT f.{follower}, p.{pk}, p.{pub_date} '
+        'FROM {follow} f JOIN {posts} p ON p.{author} = f.{followed} '
+        'WHERE f.{follower} IS NOT NULL'.format(
+            entry=qn(FeedEntry._meta.db_table),
+            user=qn(FeedEntry._meta.get_field('user').column),
+            post=qn(FeedEntry._meta.get_field('post').column),
+            date=qn(FeedEntry._meta.get_field('pub_date').column),
+            follow=qn(Follow._meta.db_table),
+            follower=qn(Follow._meta.get_field('user').column),
+            followed=qn(Follow._meta.get_field('author').column),
+            posts=qn(Post._meta.db_table),
+            pk=qn(Post._meta.pk.column),
+            pub_date=qn(Post._meta.get_field('pub_date').column),
+            author=qn(Post._meta.get_field('author').column),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0006_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-pub_date', '-post_id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique subscription'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique feed entry'),
+        ),
+        migrations.RunPython(fill_inboxes, migrations.RunPython.noop),
+    ]
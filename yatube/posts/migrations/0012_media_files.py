@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import posts.storage
+
+
+def fill_media_refs(apps, schema_editor):
+    # Копия posts.counters.recount_media на момент миграции.
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    MediaFile.objects.bulk_create(
+        MediaFile(name=name)
+        for name in Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+    )
+    MediaFile.objects.update(refs=Coalesce(Subquery(
+        Post.objects.filter(
+            image=OuterRef('name')
+        ).order_by().values('image').annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_image_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('refs', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_media_refs, migrations.RunPython.noop),
+    ]
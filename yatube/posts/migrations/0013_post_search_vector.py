@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:11
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+# GIN-индекс и триггер есть только в PostgreSQL; в других базах колонка
+# остаётся пустой, а поиск идёт по индексу в памяти (posts.search).
+FORWARD_SQL = (
+    'CREATE INDEX post_search_vector_idx ON posts_post '
+    'USING gin (search_vector)',
+    'CREATE TRIGGER post_search_vector_update '
+    'BEFORE INSERT OR UPDATE OF text ON posts_post '
+    'FOR EACH ROW EXECUTE PROCEDURE '
+    "tsvector_update_trigger(search_vector, 'pg_catalog.{config}', text)",
+    'UPDATE posts_post '
+    "SET search_vector = to_tsvector('pg_catalog.{config}', text)",
+)
+BACKWARD_SQL = (
+    'DROP TRIGGER IF EXISTS post_search_vector_update ON posts_post',
+    'DROP INDEX IF EXISTS post_search_vector_idx',
+)
+
+
+def run_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(
+                statement.format(config=settings.SEARCH_CONFIG)
+            )
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_media_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_postgresql(FORWARD_SQL), run_postgresql(BACKWARD_SQL)
+        ),
+    ]
@@ -0,0 +1,203 @@
+import heapq
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+DEFAULT_KEY = ('pub_date', 'pk')
+
+
+def encode_cursor(obj, key=DEFAULT_KEY):
+    """Упаковывает ключ (pub_date, id) объекта в непрозрачный токен."""
+    date_field, id_field = key
+    raw = '{}|{}'.format(
+        getattr(obj, date_field).isoformat(), getattr(obj, id_field)
+    )
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен в (pub_date, id) или возвращает None."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = urlsafe_b64decode(padded.encode()).decode()
+        pub_date, pk = raw.rsplit('|', 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (DecodeError, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """
+    Пагинация по ключу (pub_date, id) без OFFSET и COUNT(*).
+
+    Страница выбирается токенами ?after= (следующая страница, по
+    умолчанию более старые посты) и ?before= (предыдущая).
+    Возвращаемый объект — обычный Page, поэтому шаблоны и тесты,
+    работающие с page_obj, не меняются.
+    Поля ключа задаются параметром key: (поле даты, поле id);
+    с descending=False страницы идут от старых записей к новым.
+    """
+    cursor_mode = True
+
+    def __init__(self, object_list, per_page, after=None, before=None,
+                 key=DEFAULT_KEY, descending=True):
+        super().__init__(object_list, per_page)
+        self.key = key
+        self.descending = descending
+        self.after = decode_cursor(after)
+        self.before = None if self.after else decode_cursor(before)
+        self.cursor = after if self.after else before if self.before else ''
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def _seek(self, queryset, key, cursor, lookup):
+        date_field, id_field = key
+        pub_date, pk = cursor
+        return queryset.filter(
+            Q(**{'{}__{}'.format(date_field, lookup): pub_date})
+            | Q(**{date_field: pub_date,
+                   '{}__{}'.format(id_field, lookup): pk})
+        )
+
+    def _ordering(self, key, forward):
+        """Сортировка по ключу в направлении страниц или обратном."""
+        sign = '-' if forward == self.descending else ''
+        return [sign + field for field in key]
+
+    def _rows(self, queryset, key, cursor, forward, limit):
+        """
+        До limit строк от курсора в направлении обхода.
+
+        forward — к следующим страницам, иначе к предыдущим; без курсора
+        строки берутся с начала ленты.
+        """
+        if cursor is not None:
+            lookup = 'lt' if forward == self.descending else 'gt'
+            queryset = self._seek(queryset, key, cursor, lookup)
+        return list(queryset.order_by(*self._ordering(key, forward))[:limit])
+
+    def _page_rows(self, cursor, forward, limit):
+        return self._rows(self.object_list, self.key, cursor, forward, limit)
+
+    def _fetch(self):
+        limit = self.per_page + 1
+        if self.after:
+            rows = self._page_rows(self.after, True, limit)
+            has_next = len(rows) > self.per_page
+            return rows[:self.per_page], True, has_next
+        if self.before:
+            rows = self._page_rows(self.before, False, limit)
+            has_previous = len(rows) > self.per_page
+            return rows[:self.per_page][::-1], has_previous, True
+        rows = self._page_rows(None, True, limit)
+        return rows[:self.per_page], False, len(rows) > self.per_page
+
+    def page(self, number=None):
+        items, has_previous, has_next = self._fetch()
+        if not items:
+            has_previous = has_next = False
+        if has_next:
+            self.next_cursor = encode_cursor(items[-1], self.key)
+        if has_previous:
+            self.previous_cursor = encode_cursor(items[0], self.key)
+        number = 2 if has_previous else 1
+        self._num_pages = number + 1 if has_next else number
+        return self._get_page(items, number, self)
+
+    def get_page(self, number=None):
+        return self.page(number)
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """
+    Курсорная пагинация по нескольким лентам, слитым в одну.
+
+    sources — список (queryset, key, convert): у каждого источника свой
+    ключ (поле даты, поле id), а convert превращает его строку в пост
+    (None — строка уже пост). Страница собирается k-путевым слиянием:
+    из каждого источника берётся не больше per_page + 1 строк от
+    курсора, так что каждый источник читается одним проходом по своему
+    индексу. Пост, пришедший из двух источников, показывается один раз.
+    Курсоры и порядок — по (pub_date, id) поста, от новых к старым.
+    """
+
+    def __init__(self, sources, per_page, after=None, before=None):
+        super().__init__(sources[0][0], per_page, after=after, before=before)
+        self.sources = sources
+
+    def _page_rows(self, cursor, forward, limit):
+        streams = [
+            map(convert or (lambda row: row),
+                self._rows(queryset, key, cursor, forward, limit))
+            for queryset, key, convert in self.sources
+        ]
+        rows, seen = [], set()
+        for post in heapq.merge(
+            *streams, key=lambda post: (post.pub_date, post.pk),
+            reverse=forward,
+        ):
+            if post.pk not in seen:
+                seen.add(post.pk)
+                rows.append(post)
+                if len(rows) == limit:
+                    break
+        return rows
+
+
+def get_page(request, queryset, per_page=None, key=DEFAULT_KEY,
+             descending=True):
+    """
+    Возвращает страницу ленты.
+
+    По умолчанию используется курсорная пагинация; если в запросе
+    передан ?page=N, работает классический Paginator.
+    """
+    per_page = per_page or settings.PER_PAGE_COUNT
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return Paginator(queryset, per_page).get_page(page_number)
+    paginator = CursorPaginator(
+        queryset,
+        per_page,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        key=key,
+        descending=descending,
+    )
+    return paginator.get_page()
+
+
+def get_merged_page(request, sources, queryset, per_page=None):
+    """
+    Страница ленты, слитой из нескольких источников.
+
+    По ?page=N слияние не работает: классический Paginator листает
+    queryset, который должен давать те же посты одним запросом.
+    """
+    per_page = per_page or settings.PER_PAGE_COUNT
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return Paginator(queryset, per_page).get_page(page_number)
+    paginator = MergedCursorPaginator(
+        sources,
+        per_page,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return paginator.get_page()
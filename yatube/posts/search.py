@@ -0,0 +1,162 @@
+import math
+import re
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+
+from .models import Post
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре."""
+    return WORD_RE.findall(text.lower())
+
+
+class InMemoryIndex:
+    """
+    Инвертированный индекс постов в памяти процесса.
+
+    Запасной вариант для баз без полнотекстового поиска (SQLite в тестах
+    и разработке). Строится из базы при первом запросе и дальше
+    обновляется сигналами сохранения и удаления постов; изменения,
+    сделанные другими процессами, он не видит.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Забывает индекс: он перестроится при следующем поиске."""
+        self.postings = None
+        self.docs = {}
+
+    def _add(self, post_id, text, author_id, group_id):
+        self._remove(post_id)
+        terms = Counter(tokenize(text))
+        self.docs[post_id] = (author_id, group_id, sum(terms.values()), terms)
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[post_id] = count
+
+    def _remove(self, post_id):
+        doc = self.docs.pop(post_id, None)
+        if doc is not None:
+            for term in doc[3]:
+                self.postings[term].pop(post_id, None)
+                if not self.postings[term]:
+                    del self.postings[term]
+
+    def _load(self):
+        self.postings = {}
+        for row in Post.objects.values_list(
+            'pk', 'text', 'author_id', 'group_id'
+        ).iterator():
+            self._add(*row)
+
+    def update(self, post):
+        """Переиндексирует пост, если индекс уже построен."""
+        with self.lock:
+            if self.postings is not None:
+                self._add(post.pk, post.text, post.author_id, post.group_id)
+
+    def remove(self, post_id):
+        """Убирает пост из индекса, если индекс уже построен."""
+        with self.lock:
+            if self.postings is not None:
+                self._remove(post_id)
+
+    def search(self, query, author_id=None, group_id=None):
+        """
+        id постов, содержащих все слова запроса, по убыванию TF-IDF.
+
+        При равной релевантности новые посты идут первыми.
+        """
+        terms = set(tokenize(query))
+        with self.lock:
+            if self.postings is None:
+                self._load()
+            if not terms:
+                return []
+            postings = [self.postings.get(term, {}) for term in terms]
+            postings.sort(key=len)
+            matches = set(postings[0]).intersection(*postings[1:])
+            scores = {}
+            for post_id in matches:
+                author, group, length, _ = self.docs[post_id]
+                if author_id is not None and author != author_id:
+                    continue
+                if group_id is not None and group != group_id:
+                    continue
+                scores[post_id] = sum(
+                    posting[post_id]
+                    * math.log(1 + len(self.docs) / len(posting))
+                    for posting in postings
+                ) / math.sqrt(length)
+        return sorted(
+            scores, key=lambda post_id: (scores[post_id], post_id),
+            reverse=True
+        )
+
+
+index = InMemoryIndex()
+
+
+class RankedPosts:
+    """
+    Посты в заданном порядке id для Paginator.
+
+    Посты достаются из базы только для запрошенного среза, то есть
+    по странице за раз.
+    """
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        ids = self.ids[key] if isinstance(key, slice) else [self.ids[key]]
+        posts = self.queryset.in_bulk(ids)
+        found = [posts[pk] for pk in ids if pk in posts]
+        return found if isinstance(key, slice) else found[0]
+
+
+def uses_database_index():
+    """Ищет ли база сама: tsvector есть только в PostgreSQL."""
+    return connection.vendor == 'postgresql'
+
+
+def search_posts(query, author=None, group=None):
+    """
+    Посты по запросу в порядке релевантности, с фильтром по автору
+    и группе.
+
+    В PostgreSQL поиск идёт по колонке search_vector с GIN-индексом,
+    которую поддерживает триггер, иначе — по InMemoryIndex.
+    """
+    posts = Post.objects.for_feed()
+    if uses_database_index():
+        search_query = SearchQuery(query, config=settings.SEARCH_CONFIG)
+        if author is not None:
+            posts = posts.filter(author=author)
+        if group is not None:
+            posts = posts.filter(group=group)
+        return posts.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date', '-pk')
+    return RankedPosts(
+        index.search(
+            query,
+            author_id=getattr(author, 'pk', None),
+            group_id=getattr(group, 'pk', None),
+        ),
+        posts,
+    )
@@ -0,0 +1,297 @@
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from . import search
+from .caching import AUTHOR_CARD, GROUP_CARD, INDEX, invalidate, scope
+from .counters import bump
+from .feeds import (
+    FEEDS, author_demoted, backfill_inbox, is_celebrity, prune_inbox,
+    push_post
+)
+from .graph import follow_changed
+from .media import release, retain
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .thumbnails import schedule_thumbnails
+
+# Поля пользователя, которые видны в карточках постов.
+AUTHOR_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+def _image_name(post):
+    image = post.__dict__.get('image')
+    return getattr(image, 'name', image) or ''
+
+
+@receiver(post_init, sender=Post)
+def remember_loaded_state(sender, instance, **kwargs):
+    """Запоминает группу и картинку, чтобы при сохранении увидеть смену."""
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    instance._loaded_image = _image_name(instance)
+
+
+def follower_feed_scopes(author_id):
+    """Области лент подписчиков, в которых видны посты автора."""
+    if is_celebrity(author_id):
+        # Ленты подписчиков знаменитости зависят от её профиля (см.
+        # feeds.feed_scopes), сбрасывать их по одной не нужно.
+        return ()
+    return tuple(
+        scope('feed', user_id) for user_id in Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+    )
+
+
+def invalidate_post(post, old_group_id=None):
+    """Сбрасывает кэш страниц, на которых виден пост."""
+    invalidate(
+        INDEX,
+        scope('post', post.pk),
+        scope('profile', post.author_id),
+        *(scope('group', pk) for pk in {post.group_id, old_group_id} if pk),
+        *follower_feed_scopes(post.author_id),
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, update_fields=None,
+                      **kwargs):
+    """
+    Сбрасывает при смене имени все страницы, где оно видно: карточки
+    и профиль автора, группы с его постами, ленты его подписчиков и
+    посты с его комментариями.
+    """
+    if created or update_fields is not None \
+            and not AUTHOR_FIELDS.intersection(update_fields):
+        return
+    group_ids = Post.objects.filter(
+        author=instance, group__isnull=False
+    ).values_list('group_id', flat=True).distinct()
+    commented_ids = Comment.objects.filter(
+        author=instance
+    ).values_list('post_id', flat=True).distinct()
+    invalidate(
+        INDEX,
+        scope('profile', instance.pk),
+        scope(AUTHOR_CARD, instance.pk),
+        *(scope('group', pk) for pk in group_ids),
+        *follower_feed_scopes(instance.pk),
+        *(scope('post', pk) for pk in commented_ids),
+    )
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, created, **kwargs):
+    invalidate_post(instance, None if created else instance._loaded_group_id)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    invalidate_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        push_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    old_group_id = None if created else instance._loaded_group_id
+    if created:
+        bump(
+            UserStats.objects.filter(user_id=instance.author_id),
+            'post_count', 1
+        )
+    if old_group_id != instance.group_id:
+        if old_group_id:
+            bump(Group.objects.filter(pk=old_group_id), 'post_count', -1)
+        if instance.group_id:
+            bump(
+                Group.objects.filter(pk=instance.group_id), 'post_count', 1
+            )
+
+
+@receiver(post_save, sender=Post)
+def forget_image_hash(sender, instance, created, **kwargs):
+    """Хеш старой картинки не должен указывать на её варианты."""
+    if not created and _image_name(instance) != instance._loaded_image:
+        Post.objects.filter(pk=instance.pk).update(image_hash='')
+        instance.image_hash = ''
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, created, **kwargs):
+    image = _image_name(instance)
+    if image and (created or image != instance._loaded_image):
+        schedule_thumbnails(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def count_image_refs(sender, instance, created, **kwargs):
+    image = _image_name(instance)
+    old_image = '' if created else instance._loaded_image
+    if image != old_image:
+        if image:
+            retain(image)
+        if old_image:
+            release(old_image)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    if 'text' in instance.__dict__:
+        search.index.update(instance)
+
+
+# Подключается последним: остальные обработчики post_save для Post
+# сравнивают новые значения с запомненными при загрузке.
+@receiver(post_save, sender=Post)
+def refresh_loaded_state(sender, instance, **kwargs):
+    remember_loaded_state(sender, instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump(
+        UserStats.objects.filter(user_id=instance.author_id),
+        'post_count', -1
+    )
+    if instance.group_id:
+        bump(Group.objects.filter(pk=instance.group_id), 'post_count', -1)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    image = _image_name(instance)
+    if image:
+        release(image)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.index.remove(instance.pk)
+
+
+def _group_author_ids(group_id):
+    return list(Post.objects.filter(
+        group_id=group_id
+    ).values_list('author_id', flat=True).distinct())
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    """Запоминает авторов группы: после удаления их посты уже без неё."""
+    instance._author_ids = _group_author_ids(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    """
+    Сбрасывает страницы, где видны название и slug группы: её саму,
+    карточки и профили её авторов. Авторов в группе может быть много,
+    поэтому ленты подписок сбрасываются разом общей областью FEEDS.
+    """
+    author_ids = getattr(instance, '_author_ids', None)
+    if author_ids is None:
+        author_ids = _group_author_ids(instance.pk)
+    invalidate(
+        INDEX,
+        FEEDS,
+        scope('group', instance.pk),
+        scope(GROUP_CARD, instance.pk),
+        *(scope('profile', pk) for pk in author_ids),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    invalidate(scope('post', instance.post_id))
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        bump(
+            Post.objects.filter(pk=instance.post_id), 'comment_count', 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    bump(Post.objects.filter(pk=instance.post_id), 'comment_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    invalidate(*(
+        scope(name, pk) for name, pk in (
+            ('feed', instance.user_id),
+            ('profile', instance.user_id),
+            ('profile', instance.author_id),
+        ) if pk
+    ))
+
+
+def _change_graph(instance, followed):
+    # После коммита: откаченная подписка не должна попасть в кэш.
+    user_id, author_id = instance.user_id, instance.author_id
+    transaction.on_commit(
+        lambda: follow_changed(user_id, author_id, followed)
+    )
+
+
+@receiver(post_save, sender=Follow)
+def add_to_graph(sender, instance, created, **kwargs):
+    if created:
+        _change_graph(instance, True)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_from_graph(sender, instance, **kwargs):
+    _change_graph(instance, False)
+
+
+def _count_follow(instance, delta):
+    if instance.user_id and instance.author_id:
+        # Статус смотрится до изменения счётчика: посты, не разложенные,
+        # пока автор был знаменитостью, нужно разложить при его потере.
+        was_celebrity = delta < 0 and is_celebrity(instance.author_id)
+        bump(
+            UserStats.objects.filter(user_id=instance.author_id),
+            'follower_count', delta
+        )
+        bump(
+            UserStats.objects.filter(user_id=instance.user_id),
+            'following_count', delta
+        )
+        if was_celebrity:
+            author_demoted(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def fill_inbox_on_follow(sender, instance, created, **kwargs):
+    if created and instance.user_id and instance.author_id:
+        backfill_inbox(instance.user_id, instance.author_id)
+    if created:
+        _count_follow(instance, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_inbox_on_unfollow(sender, instance, **kwargs):
+    if instance.user_id and instance.author_id:
+        prune_inbox(instance.user_id, instance.author_id)
+    _count_follow(instance, -1)
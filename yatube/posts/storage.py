@@ -0,0 +1,44 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, раскладывающее файлы по хешу содержимого.
+
+    Файл posts/photo.jpg сохраняется как posts/ab/cd/abcd….jpg, где
+    abcd… — sha256 содержимого: одинаковые картинки хранятся один раз,
+    а каталоги не разрастаются. Ссылки постов на файлы считает
+    MediaFile, неиспользуемые файлы удаляет posts.media.collect.
+    """
+
+    def content_name(self, name, content):
+        """Имя файла по хешу содержимого в каталоге исходного имени."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        return os.path.join(
+            os.path.dirname(name),
+            digest[:2],
+            digest[2:4],
+            digest + os.path.splitext(name)[1].lower(),
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Свежая отметка времени защищает файл от сборщика, пока
+            # ссылающийся на него пост ещё не сохранён.
+            os.utime(self.path(name))
+            return name.replace('\\', '/')
+        return super().save(name, content, max_length)
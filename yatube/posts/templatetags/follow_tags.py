@@ -0,0 +1,12 @@
+from django import template
+
+from posts import graph
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def is_following(context, author_id):
+    """Подписан ли текущий пользователь на автора."""
+    user = context['user']
+    return user.is_authenticated and graph.is_following(user.pk, author_id)
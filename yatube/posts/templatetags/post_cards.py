@@ -0,0 +1,60 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.caching import AUTHOR_CARD, GROUP_CARD, get_versions, scope
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_scopes(post):
+    """Области автора и группы, чьи имя и slug видны в карточке."""
+    scopes = [scope(AUTHOR_CARD, post.author_id)]
+    if post.group_id:
+        scopes.append(scope(GROUP_CARD, post.group_id))
+    return scopes
+
+
+def card_key(post, versions=None):
+    """
+    Ключ карточки: id поста, время его изменения и версии автора и группы.
+
+    versions — заранее прочитанные версии областей всей страницы.
+    """
+    scopes = card_scopes(post)
+    if versions is None:
+        versions = get_versions(scopes)
+    return 'post_card:{}:{}:{}'.format(
+        post.pk, post.updated.timestamp(),
+        '.'.join(versions[name] for name in scopes),
+    )
+
+
+@register.simple_tag
+def post_cards(posts):
+    """
+    Возвращает список HTML-карточек постов страницы.
+
+    Версии авторов и групп и готовые карточки достаются из кэша двумя
+    get_many, недостающие карточки рендерятся и сохраняются одним
+    set_many.
+    """
+    posts = list(posts)
+    versions = get_versions({
+        name for post in posts for name in card_scopes(post)
+    })
+    cards = {card_key(post, versions): post for post in posts}
+    cached = cache.get_many(list(cards))
+    rendered = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in cards.items()
+        if key not in cached
+    }
+    if rendered:
+        cache.set_many(rendered, settings.PAGE_CACHE_TIMEOUT)
+    cached.update(rendered)
+    return [mark_safe(cached[key]) for key in cards]
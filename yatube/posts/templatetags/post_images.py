@@ -0,0 +1,64 @@
+from django import template
+from django.conf import settings
+
+from posts.thumbnails import image_formats, load_thumbnails
+from posts.thumbnails import schedule_thumbnails
+
+register = template.Library()
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+
+def _srcset(variants):
+    return ', '.join(
+        '{} {}w'.format(image.url, width) for width, image in variants
+    )
+
+
+@register.simple_tag
+def post_picture(post):
+    """
+    Готовые варианты картинки поста для <picture> или None.
+
+    Варианты генерирует фоновый воркер; пока не готовы все, генерация
+    ставится в очередь, а шаблон показывает то, что есть, или заглушку.
+    Варианты, заранее загруженные prefetch_thumbnails, берутся из
+    post.thumbnails.
+    """
+    if not post.image:
+        return None
+    if getattr(post, 'thumbnails', None) is None:
+        load_thumbnails([post])
+    if not post.thumbnails or None in post.thumbnails.values():
+        schedule_thumbnails(post.pk)
+    variants = {}
+    for (image_format, width), image in post.thumbnails.items():
+        if image is not None:
+            variants.setdefault(image_format, []).append((width, image))
+    *formats, fallback = image_formats()
+    if fallback not in variants:
+        return None
+    default_width = settings.POST_IMAGE_ASPECT[0]
+    width, image = min(
+        variants[fallback], key=lambda item: abs(item[0] - default_width)
+    )
+    return {
+        'sources': [
+            {
+                'type': MIME_TYPES.get(
+                    image_format, 'image/' + image_format.lower()
+                ),
+                'srcset': _srcset(variants[image_format]),
+            }
+            for image_format in formats if image_format in variants
+        ],
+        'src': image.url,
+        'srcset': _srcset(variants[fallback]),
+        'width': image.width,
+        'height': image.height,
+    }
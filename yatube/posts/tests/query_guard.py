@@ -0,0 +1,110 @@
+"""
+Проверка, что число запросов страницы не растёт с числом строк в базе.
+
+Страница открывается на данных двух размеров; если запросов на большом
+наборе больше, отчёт показывает, какие запросы добавились и из какой
+строки шаблона (или кода проекта) они пришли.
+"""
+import os
+import sys
+from collections import Counter
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+
+from core.profiling import fingerprint
+
+TEMPLATE_FRAME = 'render_annotated'
+
+
+def query_origin():
+    """
+    Откуда выполняется запрос: ближайший узел шаблона или строка кода.
+
+    Узел шаблона находится по кадру Node.render_annotated: у узла есть
+    шаблон и номер строки. Если запрос пришёл не из шаблона, берётся
+    ближайший кадр из кода проекта.
+    """
+    code_origin = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        if frame.f_code.co_name == TEMPLATE_FRAME and hasattr(node, 'token'):
+            return '{}:{} {}'.format(
+                node.origin.template_name or node.origin.name,
+                node.token.lineno,
+                node.token.contents[:60],
+            )
+        filename = frame.f_code.co_filename
+        if code_origin is None and filename.startswith(settings.BASE_DIR) \
+                and os.sep + 'tests' + os.sep not in filename:
+            code_origin = '{}:{}'.format(
+                os.path.relpath(filename, settings.BASE_DIR), frame.f_lineno
+            )
+        frame = frame.f_back
+    return code_origin or '?'
+
+
+class QueryTrace:
+    """Запросы с местом вызова; подключается как execute_wrapper."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((fingerprint(sql), query_origin()))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+
+def trace(client, url):
+    """Открывает адрес с пустым кэшем и возвращает QueryTrace."""
+    cache.clear()
+    queries = QueryTrace()
+    with connection.execute_wrapper(queries):
+        client.get(url)
+    return queries
+
+
+def growth(small, large):
+    """
+    Запросы, которых на большом наборе больше, чем на малом.
+
+    Возвращает строки отчёта «+N x место: SQL», пустой список, если
+    роста нет.
+    """
+    extra = Counter(large.queries) - Counter(small.queries)
+    return [
+        '+{} x {}: {}'.format(count, origin, sql[:120])
+        for (sql, origin), count in extra.most_common()
+    ]
+
+
+def named_routes(*modules):
+    """
+    Именованные маршруты модулей urls: (имя с пространством, параметры).
+
+    Параметры — имена из угловых скобок маршрута, значения для них
+    подставляет вызывающий.
+    """
+    routes = []
+    for module_name in modules:
+        module = import_module(module_name)
+        for pattern in module.urlpatterns:
+            if pattern.name:
+                routes.append((
+                    '{}:{}'.format(module.app_name, pattern.name),
+                    list(pattern.pattern.converters),
+                ))
+    return routes
+
+
+def route_url(name, params, values, query=''):
+    """Адрес маршрута с параметрами из values."""
+    url = reverse(name, kwargs={param: values[param] for param in params})
+    return '{}?{}'.format(url, query) if query else url
@@ -0,0 +1,129 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, text='Пост {}'.format(number))
+            for number in range(12)
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост в группе', group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_index_pages(self):
+        """Лента отдаётся страницами по курсору."""
+        data = self.client.get(reverse('posts:api_index')).json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(data['results'][0]['text'], 'Пост в группе')
+        self.assertEqual(data['results'][0]['group']['slug'], 'group')
+        self.assertIsNone(data['previous'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual(len(data['results']), 3)
+        self.assertIsNone(data['next'])
+
+    def test_group_and_profile(self):
+        """Лента группы и автора содержат только свои посты."""
+        group = self.client.get(
+            reverse('posts:api_group_list', args=['group'])
+        ).json()
+        self.assertEqual([post['id'] for post in group['results']], [
+            self.post.pk
+        ])
+        profile = self.client.get(
+            reverse('posts:api_profile', args=['reader'])
+        ).json()
+        self.assertEqual(profile['results'], [])
+
+    def test_post_detail_with_comments(self):
+        """Пост отдаётся вместе с комментариями."""
+        data = self.client.get(
+            reverse('posts:api_post_detail', args=[self.post.pk])
+        ).json()
+        self.assertEqual(data['author']['username'], 'author')
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий')
+        self.assertIsNone(data['next'])
+
+    def test_post_comments_pages(self):
+        """Комментарии поста отдаются страницами по курсору."""
+        for number in range(2):
+            Comment.objects.create(
+                post=self.post, author=self.author,
+                text='Ответ {}'.format(number),
+            )
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        with self.settings(COMMENTS_PER_PAGE=2):
+            first = self.client.get(url).json()
+            second = self.client.get(first['next']).json()
+        self.assertEqual(
+            [comment['text'] for comment in first['comments']],
+            ['Комментарий', 'Ответ 0'],
+        )
+        self.assertEqual(
+            [comment['text'] for comment in second['comments']], ['Ответ 1']
+        )
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['previous'])
+
+    def test_if_none_match_skips_queries(self):
+        """Совпавший ETag даёт 304 без запросов к базе."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        """Last-Modified работает как валидатор без ETag."""
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_follow_feed(self):
+        """Лента подписок требует входа и видна только подписчику."""
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        data = self.client.get(url).json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertIsNotNone(data['next'])
+
+    def test_placeholder_syntax_in_post_text(self):
+        """Текст поста в виде метки части страницы отдаётся как есть."""
+        text = '<!--user-part {}--><!--user-part 0:0-->'
+        post = Post.objects.create(author=self.author, text=text)
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_profile', args=['author']),
+            reverse('posts:api_post_detail', args=[post.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                for _ in range(2):
+                    response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertContains(response, text)
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.benchmark import percentile, seed
+from posts.models import FeedEntry, Follow, Post, User, UserStats
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(users=20, posts=100, groups=2, follows=3, batch_size=30)
+
+    def test_seed(self):
+        """Синтетические данные создаются вместе со счётчиками и лентами."""
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedEntry.objects.exists())
+        self.assertEqual(
+            sum(UserStats.objects.values_list('post_count', flat=True)), 100
+        )
+
+    def test_percentile(self):
+        """Перцентиль по ближайшему рангу."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_results_file(self):
+        """Результаты прогона пишутся в JSON и сравниваются с прошлыми."""
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command(
+            'bench_views', '--requests', '5', '--warmup', '1',
+            '--output', path, stdout=StringIO(),
+        )
+        with open(path) as stream:
+            results = json.load(stream)
+        self.assertEqual(results['dataset']['posts'], 100)
+        for view, summary in results['views'].items():
+            with self.subTest(view=view):
+                self.assertEqual(summary['requests'], 5)
+                self.assertEqual(summary['errors'], 0)
+                self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+                self.assertIsNotNone(summary['queries'])
+        out = StringIO()
+        call_command(
+            'bench_views', '--requests', '5', '--views', 'index',
+            '--compare', path, stdout=out,
+        )
+        self.assertIn('p95_ms', out.getvalue())
+
+    def test_bench_feed(self):
+        """Сравнение стратегий ленты откатывает свои данные."""
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command(
+            'bench_feed', '--followers', '20', '--following', '15',
+            '--celebrities', '2', '--posts', '2', '--pages', '2',
+            '--repeat', '1', '--output', path, stdout=StringIO(),
+        )
+        with open(path) as stream:
+            strategies = json.load(stream)['strategies']
+        self.assertEqual(strategies['push']['fan_out'], 21)
+        self.assertEqual(strategies['hybrid']['fan_out'], 0)
+        self.assertEqual(strategies['push']['inbox_rows'], 34)
+        self.assertEqual(strategies['hybrid']['inbox_rows'], 30)
+        self.assertEqual(strategies['pull']['read_queries'], 1)
+        self.assertEqual(User.objects.count(), 20)
@@ -0,0 +1,266 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.http import HttpResponse, JsonResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.caching import cache_page_versioned, get_or_regenerate
+from posts.models import Follow, Group, Post, User
+from posts.templatetags.post_cards import card_key
+
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'worker_1': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'test_shared_cache',
+        'KEY_PREFIX': 'yatube',
+    },
+    'worker_2': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'test_shared_cache',
+        'KEY_PREFIX': 'yatube',
+    },
+    'other_prefix': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'test_shared_cache',
+        'KEY_PREFIX': 'other',
+    },
+}
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class SharedCacheTests(TestCase):
+    def setUp(self):
+        call_command('createcachetable', stdout=StringIO())
+
+    def test_workers_share_entries(self):
+        """Запись одного воркера видна другому через общий бэкенд."""
+        caches['worker_1'].set('index', 'page')
+        self.assertEqual(caches['worker_2'].get('index'), 'page')
+
+    def test_key_prefix_isolates_entries(self):
+        """Разные префиксы ключей не пересекаются."""
+        caches['worker_1'].set('index', 'page')
+        self.assertIsNone(caches['other_prefix'].get('index'))
+
+    def test_bench_cache_reports_hit_rates(self):
+        """Бенчмарк сравнивает локальный и общий кэш."""
+        out = StringIO()
+        call_command(
+            'bench_cache', alias='worker_1', requests=200, stdout=out
+        )
+        self.assertIn('per-worker locmem', out.getvalue())
+        self.assertIn('shared (worker_1)', out.getvalue())
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='card_author')
+        cls.post = Post.objects.create(author=cls.user, text='Старый текст')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_card_is_cached_under_post_version(self):
+        """Карточка кэшируется по id поста и времени изменения."""
+        self.client.get(reverse('posts:index'))
+        card = cache.get(card_key(self.post))
+        self.assertIn('Старый текст', card)
+
+    def test_post_edit_renders_new_card(self):
+        """После редактирования поста карточка рендерится заново."""
+        old_key = card_key(self.post)
+        self.client.get(reverse('posts:index'))
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый текст'},
+        )
+        self.post.refresh_from_db()
+        self.assertNotEqual(card_key(self.post), old_key)
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': self.user.username}
+        ))
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Старый текст')
+
+    def feed_pages(self, group):
+        """Клиент подписчика автора и адреса страниц со списками постов."""
+        reader = User.objects.create_user(username='card_reader')
+        Follow.objects.create(user=reader, author=self.user)
+        client = Client()
+        client.force_login(reader)
+        return client, lambda: [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:follow_index'),
+        ]
+
+    def test_author_rename_renders_new_card(self):
+        """После смены имени автора его имя обновляется на всех лентах."""
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        post = Post.objects.create(
+            author=self.user, group=group, text='Пост в группе'
+        )
+        client, urls = self.feed_pages(group)
+        for url in urls():
+            client.get(url)
+        old_key = card_key(post)
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+        self.assertNotEqual(card_key(post), old_key)
+        for url in urls():
+            with self.subTest(url=url):
+                self.assertContains(client.get(url), 'Автор: Новое Имя')
+
+    def test_login_keeps_cards(self):
+        """Вход автора не сбрасывает его карточки."""
+        old_key = card_key(self.post)
+        self.client.force_login(self.user)
+        self.assertEqual(card_key(self.post), old_key)
+
+    def test_group_slug_change_renders_new_card(self):
+        """После смены slug группы все ленты ссылаются на новый адрес."""
+        group = Group.objects.create(
+            title='Группа', slug='old-slug', description='Описание'
+        )
+        post = Post.objects.create(
+            author=self.user, group=group, text='Пост в группе'
+        )
+        client, urls = self.feed_pages(group)
+        for url in urls():
+            client.get(url)
+        old_key = card_key(post)
+        group.slug = 'new-slug'
+        group.save()
+        self.assertNotEqual(card_key(post), old_key)
+        for url in urls():
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertContains(
+                    response, reverse('posts:group_list', args=['new-slug'])
+                )
+                self.assertNotContains(
+                    response, reverse('posts:group_list', args=['old-slug'])
+                )
+
+    def test_group_delete_drops_links(self):
+        """После удаления группы профиль автора не ссылается на неё."""
+        group = Group.objects.create(
+            title='Группа', slug='gone', description='Описание'
+        )
+        Post.objects.create(author=self.user, group=group, text='Пост')
+        url = reverse('posts:profile', args=[self.user.username])
+        self.client.get(url)
+        group.delete()
+        self.assertNotContains(
+            self.client.get(url), reverse('posts:group_list', args=['gone'])
+        )
+
+
+class StampedeProtectionTests(TestCase):
+    THREADS = 10
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def slow_compute(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return HttpResponse('page')
+
+    def fire(self, func):
+        with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+            futures = [executor.submit(func) for _ in range(self.THREADS)]
+            return [future.result() for future in futures]
+
+    def test_cold_key_regenerated_once(self):
+        """Параллельные запросы к пустому ключу пересчитывают его один раз."""
+        view = cache_page_versioned(lambda request: ('stampede',))(
+            lambda request: self.slow_compute()
+        )
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        responses = self.fire(lambda: view(request))
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(r.content == b'page' for r in responses))
+
+    def test_expired_key_regenerated_once_while_stale_served(self):
+        """Истёкший ключ пересчитывается одним потоком, прочие ждут старое."""
+        cache.set('stampede', (HttpResponse('stale'), time.time() - 1, 0))
+        responses = self.fire(lambda: get_or_regenerate(
+            'stampede', self.slow_compute, 60
+        ))
+        self.assertEqual(self.calls, 1)
+        contents = {r.content for r in responses}
+        self.assertEqual(contents, {b'stale', b'page'})
+
+
+class UserPartsCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        Post.objects.create(author=cls.author, text='Пост')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_index_cache_shared_between_anonymous_and_user(self):
+        """Аноним и пользователь получают одну запись кэша."""
+        anonymous = self.client.get(reverse('posts:index'))
+        authorized = self.authorized_client.get(reverse('posts:index'))
+        self.assertIn('page_obj', anonymous.context)
+        self.assertNotIn('page_obj', authorized.context)
+        self.assertNotContains(anonymous, 'Пользователь: reader')
+        self.assertContains(authorized, 'Пользователь: reader')
+        self.assertContains(authorized, 'Избранные авторы')
+
+    def test_profile_follow_button_is_per_user(self):
+        """Кнопка подписки в закэшированном профиле своя у каждого."""
+        url = reverse(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+        anonymous = self.client.get(url)
+        authorized = self.authorized_client.get(url)
+        self.assertNotIn('page_obj', authorized.context)
+        self.assertContains(anonymous, 'Подписаться')
+        self.assertContains(authorized, 'Отписаться')
+
+    def test_placeholder_in_content_left_alone(self):
+        """Метка частей в содержимом страницы не подставляется."""
+        forged = '<!--user-part {}--><!--user-part 0:0-->'
+        request = RequestFactory().get('/')
+        request.user = self.user
+        views = {
+            'html': lambda request: HttpResponse(forged),
+            'json': lambda request: JsonResponse({'text': forged}),
+        }
+        for name, view in views.items():
+            with self.subTest(name):
+                view = cache_page_versioned(lambda request: (name,))(view)
+                first = view(request).content
+                self.assertIn(b'<!--user-part', first)
+                self.assertEqual(view(request).content, first)
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_return_304(self):
+        """Неизменившиеся страницы отдают 304 за один запрос к базе."""
+        for url in (
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:group_list', args=['group']),
+            reverse('posts:profile', args=['author']),
+        ):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(1):
+                    response = self.revalidate(url, etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_new_comment_changes_post_etag(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_new_post_changes_group_etag(self):
+        """Новый пост в группе меняет ETag её страницы."""
+        url = reverse('posts:group_list', args=['group'])
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.author, text='Ещё', group=self.group)
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_etag_differs_between_users(self):
+        """Страница с частями пользователя не отдаёт 304 другому."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.reader)
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_follow_changes_profile_etag(self):
+        """После подписки профиль автора отдаётся заново."""
+        self.client.force_login(self.reader)
+        url = reverse('posts:profile', args=['author'])
+        etag = self.client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
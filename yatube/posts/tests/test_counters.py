@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group_1 = Group.objects.create(
+            title='Группа_1',
+            slug='counter-slug_1',
+            description='Описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Группа_2',
+            slug='counter-slug_2',
+            description='Описание',
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счётчики."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group_1
+        )
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.group_1.refresh_from_db()
+        self.assertEqual(self.group_1.post_count, 1)
+        post.group = self.group_2
+        post.save()
+        self.group_1.refresh_from_db()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.group_1.post_count, 0)
+        self.assertEqual(self.group_2.post_count, 1)
+        post.delete()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.stats(self.author).post_count, 0)
+        self.assertEqual(self.group_2.post_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки учитываются, включая каскадное удаление."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.user.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет расхождения счётчиков."""
+        Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.filter(user=self.author).update(post_count=42)
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).post_count, 1)
+
+    def test_recount_skips_follows_without_user(self):
+        """recount, как и сигналы, не считает подписки без второй стороны."""
+        user = User.objects.create_user(username='lonely')
+        Follow.objects.create(user=None, author=user)
+        Follow.objects.create(user=user, author=None)
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.stats(user).follower_count, 0)
+        self.assertEqual(self.stats(user).following_count, 0)
@@ -0,0 +1,180 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import FeedEntry, Follow, Post, User
+
+
+class FeedInboxTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_follow_backfills_inbox(self):
+        """После подписки во «входящих» появляются старые посты автора."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=self.old_post
+        ).exists())
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост раскладывается подписчикам при сохранении."""
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
+    def test_unfollow_prunes_inbox(self):
+        """После отписки посты автора убираются из «входящих»."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_rebuild_feeds_command(self):
+        """Команда rebuild_feeds восстанавливает «входящие» с нуля."""
+        Follow.objects.create(user=self.user, author=self.author)
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(
+            list(FeedEntry.objects.values_list('user', 'post')),
+            [(self.user.id, self.old_post.id)]
+        )
+
+    def test_rebuild_resets_cached_feeds(self):
+        """После rebuild_feeds закэшированная лента показывает новые посты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        url = reverse('posts:follow_index')
+        self.authorized_client.get(url)
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Пост без сигналов')
+        ])
+        self.assertNotContains(
+            self.authorized_client.get(url), 'Пост без сигналов'
+        )
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertContains(
+            self.authorized_client.get(url), 'Пост без сигналов'
+        )
+
+
+@override_settings(FEED_CELEBRITY_FOLLOWERS=2, PER_PAGE_COUNT=10)
+class HybridFeedTests(TestCase):
+    """Посты авторов с двумя подписчиками и больше читаются при показе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='hybrid_reader')
+        cls.fan = User.objects.create_user(username='hybrid_fan')
+        cls.writer = User.objects.create_user(username='hybrid_writer')
+        cls.star = User.objects.create_user(username='hybrid_star')
+        Follow.objects.create(user=cls.reader, author=cls.writer)
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        Follow.objects.create(user=cls.fan, author=cls.star)
+        # Множество знаменитостей закэшировано, пока подписчиков не было.
+        cache.clear()
+        for number in range(7):
+            for author in (cls.writer, cls.star):
+                Post.objects.create(
+                    author=author, text='Пост {}'.format(number)
+                )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def expected(self):
+        return list(Post.objects.filter(
+            author__in=(self.writer, self.star)
+        ).order_by('-pub_date', '-pk'))
+
+    def test_celebrity_posts_are_not_pushed(self):
+        """Посты знаменитости не раскладываются по «входящим»."""
+        self.assertFalse(
+            FeedEntry.objects.filter(post__author=self.star).exists()
+        )
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 7
+        )
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(
+            set(FeedEntry.objects.values_list('post__author', flat=True)),
+            {self.writer.pk},
+        )
+
+    def test_pages_merge_inbox_and_celebrities(self):
+        """Курсорные страницы идут в порядке дат без пропусков и повторов."""
+        url = reverse('posts:follow_index')
+        first = self.client.get(url).context['page_obj']
+        cursor = first.paginator.next_cursor
+        second = self.client.get(url, {'after': cursor}).context['page_obj']
+        self.assertEqual(list(first) + list(second), self.expected())
+        self.assertFalse(second.has_next())
+        back = self.client.get(
+            url, {'before': second.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_classic_pages(self):
+        """?page=N листает те же посты одним запросом по подпискам."""
+        response = self.client.get(
+            reverse('posts:follow_index'), {'page': 2}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), self.expected()[10:]
+        )
+
+    def test_post_pushed_before_becoming_celebrity_shown_once(self):
+        """Пост из «входящих» и из ленты знаменитости показывается раз."""
+        post = self.expected()[0]
+        FeedEntry.objects.create(
+            user=self.reader, post=post, pub_date=post.pub_date
+        )
+        page_obj = self.client.get(
+            reverse('posts:follow_index')
+        ).context['page_obj']
+        self.assertEqual(list(page_obj), self.expected()[:10])
+
+    def test_demoted_celebrity_posts_stay_in_feed(self):
+        """Автор ниже порога: его посты раскладываются и не пропадают."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        Follow.objects.get(user=self.fan, author=self.star).delete()
+        self.assertEqual(
+            FeedEntry.objects.filter(
+                user=self.reader, post__author=self.star
+            ).count(), 7
+        )
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(
+            url, {'after': first.paginator.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(first) + list(second), self.expected())
+        new_post = Post.objects.create(author=self.star, text='Уже не звезда')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=new_post
+        ).exists())
+
+    def test_celebrity_post_resets_cached_feed(self):
+        """Новый пост знаменитости сразу виден в кэшированной ленте."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        Post.objects.create(author=self.star, text='Свежий пост звезды')
+        self.assertContains(self.client.get(url), 'Свежий пост звезды')
+        data = self.client.get(reverse('posts:api_follow_index')).json()
+        self.assertEqual(data['results'][0]['text'], 'Свежий пост звезды')
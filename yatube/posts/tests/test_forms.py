@@ -1,10 +1,12 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image, ImageCms
 
 from posts.forms import PostForm
 from posts.models import Comment, Group, Post, User
@@ -214,3 +216,107 @@ class PostFormTests(TestCase):
         created_comment = Comment.objects.last()
         self.assertEqual(created_comment.post, comment_form['post'])
         self.assertEqual(created_comment.text, comment_form['text'])
+
+
+def make_jpeg(width, height):
+    image = Image.new('RGB', (width, height), 'teal')
+    exif = Image.Exif()
+    exif[0x010F] = 'Test camera'
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(
+        'photo.jpg', buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_MAX_SIDE=100,
+    POST_IMAGE_MAX_PIXELS=10 ** 6,
+)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create(self, image):
+        return self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с фото', 'image': image},
+        )
+
+    def test_image_downscaled_and_exif_stripped(self):
+        """Картинка уменьшается до POST_IMAGE_MAX_SIDE и теряет EXIF."""
+        self.create(make_jpeg(400, 200))
+        post = Post.objects.get(text='Пост с фото')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_png_icc_profile_stripped(self):
+        """ICC-профиль PNG при пересохранении не переносится."""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'teal').save(
+            buffer, 'PNG',
+            icc_profile=ImageCms.ImageCmsProfile(
+                ImageCms.createProfile('sRGB')
+            ).tobytes(),
+        )
+        self.create(SimpleUploadedFile(
+            'photo.png', buffer.getvalue(), content_type='image/png'
+        ))
+        post = Post.objects.get(text='Пост с фото')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'PNG')
+            self.assertNotIn('icc_profile', image.info)
+
+    def test_oversized_file_rejected(self):
+        """Файл больше POST_IMAGE_MAX_BYTES отклоняется."""
+        with self.settings(POST_IMAGE_MAX_BYTES=100):
+            response = self.create(make_jpeg(400, 200))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 100\xa0байт.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше POST_IMAGE_MAX_PIXELS отклоняется."""
+        response = self.create(make_jpeg(2000, 1000))
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 1 мегапикселей.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_csrf_checked_in_upload_views(self):
+        """Замена обработчиков загрузки не отключает проверку CSRF."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с фото', 'image': make_jpeg(40, 20)},
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Post.objects.exists())
+
+    def test_too_many_pixels_rejected_on_edit(self):
+        """При редактировании слишком большая картинка тоже отклоняется."""
+        post = Post.objects.create(author=self.user, text='Без фото')
+        response = self.client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            data={'text': 'С фото', 'image': make_jpeg(2000, 1000)},
+        )
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 1 мегапикселей.'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Без фото')
+        self.assertFalse(post.image)
@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import graph
+from posts.models import Follow, User
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='graph_reader')
+        cls.authors = [
+            User.objects.create_user(username='graph_author_{}'.format(i))
+            for i in range(5)
+        ]
+        for author in cls.authors[:3]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_sets_loaded_once(self):
+        """Множество читается из базы один раз, дальше проверки из кэша."""
+        with self.assertNumQueries(1):
+            graph.following_ids(self.reader.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                graph.is_following(self.reader.pk, self.authors[0].pk)
+            )
+            self.assertFalse(
+                graph.is_following(self.reader.pk, self.authors[4].pk)
+            )
+        self.assertEqual(
+            graph.follower_ids(self.authors[0].pk), {self.reader.pk}
+        )
+
+    def test_batched_check(self):
+        """Подписки на страницу авторов проверяются за одно обращение."""
+        ids = [author.pk for author in self.authors]
+        graph.following_ids(self.reader.pk)
+        with self.assertNumQueries(0):
+            followed = graph.following_among(self.reader.pk, ids)
+        self.assertEqual(followed, set(ids[:3]))
+
+    @mock.patch(
+        'posts.signals.transaction.on_commit', lambda callback: callback()
+    )
+    def test_follow_and_unfollow_update_cached_sets(self):
+        """Подписка и отписка правят загруженные множества обеих сторон."""
+        author = self.authors[4]
+        graph.following_ids(self.reader.pk)
+        graph.follower_ids(author.pk)
+        self.client.get(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.is_following(self.reader.pk, author.pk))
+            self.assertIn(self.reader.pk, graph.follower_ids(author.pk))
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[author.username])
+        )
+        with self.assertNumQueries(0):
+            self.assertFalse(graph.is_following(self.reader.pk, author.pk))
+            self.assertNotIn(self.reader.pk, graph.follower_ids(author.pk))
+
+    def test_reset(self):
+        """Сброс графа заставляет перечитать множества из базы."""
+        graph.following_ids(self.reader.pk)
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.authors[3])]
+        )
+        graph.reset()
+        self.assertIn(self.authors[3].pk, graph.following_ids(self.reader.pk))
+
+    @override_settings(FOLLOWS_PER_PAGE=2)
+    def test_following_page(self):
+        """Подписки листаются по курсору, новые подписки первыми."""
+        url = reverse('posts:following', args=[self.reader.username])
+        response = self.client.get(url)
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.authors[2], self.authors[1]],
+        )
+        after = response.context['page_obj'].paginator.next_cursor
+        response = self.client.get(url, {'after': after})
+        self.assertEqual(list(response.context['page_obj']), [self.authors[0]])
+
+    def test_followers_page_marks_followed(self):
+        """На странице подписчиков видно, на кого подписан посетитель."""
+        follower = self.authors[4]
+        Follow.objects.create(user=follower, author=self.authors[0])
+        response = self.client.get(
+            reverse('posts:followers', args=[self.authors[0].username])
+        )
+        self.assertEqual(
+            set(response.context['page_obj']), {self.reader, follower}
+        )
+        self.assertEqual(response.context['followed'], set())
+        self.assertContains(
+            response,
+            reverse('posts:profile_follow', args=[follower.username]),
+        )
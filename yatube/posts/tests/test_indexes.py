@@ -0,0 +1,119 @@
+import re
+
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import get_page
+from posts.views import COMMENTS_KEY
+
+SORT_IN_PLAN = re.compile(r'TEMP B-TREE|\bSort\b')
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='planner')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='plan-slug',
+            description='Описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост',
+            group=cls.group,
+        )
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.user,
+                text='Текст {}'.format(number),
+            )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def explain(self, queryset):
+        """Возвращает план запроса на текущей СУБД."""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def explain_sql(self, sql):
+        """План уже выполненного запроса по его тексту."""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = self.explain(queryset)
+        self.assertIn(index_name, plan)
+        self.assertNotRegex(plan, SORT_IN_PLAN)
+
+    def comments_page(self, **params):
+        """
+        Страница комментариев, как на странице поста, и SQL её запроса.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            page = get_page(
+                RequestFactory().get('/', params),
+                self.post.comments.select_related('author'),
+                per_page=1,
+                key=COMMENTS_KEY,
+                descending=False,
+            )
+        return page, queries.captured_queries[-1]['sql']
+
+    def test_global_feed_uses_index(self):
+        """Главная лента читается по индексу без сортировки."""
+        self.assertUsesIndex(
+            Post.objects.for_feed().order_by('-pub_date', '-pk')[:11],
+            'post_pub_date_idx'
+        )
+
+    def test_author_feed_uses_index(self):
+        """Лента автора читается по индексу без сортировки."""
+        self.assertUsesIndex(
+            Post.objects.filter(author=self.author).order_by(
+                '-pub_date', '-pk'
+            )[:11],
+            'post_author_pub_date_idx'
+        )
+
+    def test_group_feed_uses_index(self):
+        """Лента группы читается по индексу без сортировки."""
+        self.assertUsesIndex(
+            Post.objects.filter(group=self.group).order_by(
+                '-pub_date', '-pk'
+            )[:11],
+            'post_group_pub_date_idx'
+        )
+
+    def test_post_comments_use_index(self):
+        """
+        Первая и следующая страницы комментариев читаются по индексу
+        без сортировки.
+        """
+        first, first_sql = self.comments_page()
+        _, after_sql = self.comments_page(
+            after=first.paginator.next_cursor
+        )
+        for sql in (first_sql, after_sql):
+            with self.subTest(sql=sql):
+                plan = self.explain_sql(sql)
+                self.assertIn('comment_post_created_idx', plan)
+                self.assertNotRegex(plan, SORT_IN_PLAN)
+
+    def test_follow_lookup_uses_index(self):
+        """Проверка подписки идёт по индексу."""
+        plan = self.explain(
+            Follow.objects.filter(author=self.author, user=self.user)
+        )
+        self.assertRegex(plan, r'INDEX|Index')
+        self.assertNotRegex(plan, r'SCAN posts_follow\b|Seq Scan')
@@ -1,6 +1,9 @@
 from django.conf import settings
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Group, Post, User
@@ -27,6 +30,9 @@ class PaginatorViewsTest(TestCase):
         p = Paginator(cls.post, settings.PER_PAGE_COUNT)
         cls.cnt = p.count
 
+    def setUp(self):
+        cache.clear()
+
     def test_index_page_contains_10_records(self):
         '''На страницу index выводится по 10 постов'''
         response = self.client.get(reverse('posts:index'))
@@ -75,3 +81,50 @@ class PaginatorViewsTest(TestCase):
         )
         self.assertEqual(len(response.context['page_obj']),
                          self.cnt % settings.PER_PAGE_COUNT)
+
+    def test_index_cursor_pages_cover_all_posts(self):
+        '''Курсорная пагинация проходит все посты без повторов'''
+        response = self.client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        self.assertTrue(first_page.has_next())
+        self.assertFalse(first_page.has_previous())
+        response = self.client.get(
+            reverse('posts:index')
+            + '?after=' + first_page.paginator.next_cursor
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), self.cnt % settings.PER_PAGE_COUNT)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        ids = [post.id for post in first_page] + [
+            post.id for post in second_page
+        ]
+        self.assertEqual(len(set(ids)), self.cnt)
+        response = self.client.get(
+            reverse('posts:index')
+            + '?before=' + second_page.paginator.previous_cursor
+        )
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            [post.id for post in first_page]
+        )
+
+    def test_cursor_page_does_not_count_posts(self):
+        '''Курсорная страница не выполняет COUNT(*) по постам'''
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse(
+                'posts:group_list', kwargs={'slug': self.group_1.slug})
+            )
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        '''Некорректный токен отдаёт первую страницу'''
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': self.user.username})
+            + '?after=broken'
+        )
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.PER_PAGE_COUNT)
+        self.assertFalse(response.context['page_obj'].has_previous())
@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.profiling import REGISTRY_KEY, fingerprint, report, stats
+from posts.models import Post, User
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='profiled')
+        Post.objects.create(author=cls.user, text='Профилируемый пост')
+
+    def setUp(self):
+        cache.clear()
+        stats.clear()
+
+    def test_fingerprint_strips_values(self):
+        """Отпечаток не зависит от значений и длины списка IN."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND s = 'a'"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s) AND s = 'bb'"),
+        )
+
+    def test_view_totals(self):
+        """Сводка вьюхи: запросы к базе, рендер, кэш страниц и размер."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        totals = report()['views']['posts:index']
+        self.assertEqual(totals['requests'], 2)
+        self.assertGreater(totals['queries'], 0)
+        self.assertGreater(totals['render_seconds'], 0)
+        self.assertEqual(totals['cache_hits'], 1)
+        self.assertEqual(totals['cache_misses'], 1)
+        self.assertGreater(totals['bytes'], 0)
+
+    @override_settings(PROFILING_SLOW_MS=0)
+    def test_slow_requests_sampled(self):
+        """Медленные запросы сохраняются с отпечатками SQL."""
+        self.client.get(reverse('posts:index'))
+        sample = report()['slow'][0]
+        self.assertEqual(sample['view'], 'posts:index')
+        self.assertTrue(sample['top_queries'])
+        self.assertNotIn('%s', sample['top_queries'][0][0])
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_sample_rate(self):
+        """Запросы вне выборки не замеряются."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(report()['views'], {})
+
+    @override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_SLOW_MS=0)
+    def test_slow_requests_outside_sample(self):
+        """Медленный запрос вне выборки попадает в отчёт без SQL."""
+        self.client.get(reverse('posts:index'))
+        data = report()
+        self.assertEqual(data['views'], {})
+        self.assertEqual(data['slow'][0]['view'], 'posts:index')
+        self.assertIsNone(data['slow'][0]['queries'])
+        out = StringIO()
+        call_command('profile_report', stdout=out)
+        self.assertIn('вне выборки', out.getvalue())
+
+    def test_registry_drops_expired_processes(self):
+        """Реестр забывает процессы, чьи сводки истекли."""
+        cache.set(REGISTRY_KEY, ['profiling:gone:1'])
+        stats.flush()
+        self.assertEqual(cache.get(REGISTRY_KEY), [stats.key])
+
+    def test_report_does_not_register(self):
+        """Чтение отчёта не вносит процесс в реестр."""
+        self.client.get(reverse('posts:index'))
+        call_command('profile_report', stdout=StringIO())
+        self.assertIsNone(cache.get(REGISTRY_KEY))
+        self.assertEqual(report()['views']['posts:index']['requests'], 1)
+
+    def test_endpoint_for_staff_only(self):
+        """Сводку в JSON видит только персонал."""
+        url = reverse('profiling_report')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', self.client.get(url).json()['views'])
+
+    def test_command(self):
+        """Команда печатает строку по каждой вьюхе."""
+        self.client.get(reverse('posts:index'))
+        out = StringIO()
+        call_command('profile_report', '--reset', stdout=out)
+        self.assertIn('posts:index', out.getvalue())
+        self.assertEqual(report()['views'], {})
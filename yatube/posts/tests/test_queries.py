@@ -0,0 +1,127 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class FeedQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='queries-slug',
+            description='Описание',
+        )
+        cls.authors = [
+            User.objects.create_user(username='author_{}'.format(i))
+            for i in range(10)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def add_posts(self, count):
+        """Каждый пост — от своего автора, чтобы поймать N+1 по автору."""
+        for author in self.authors[:count]:
+            Post.objects.create(author=author, text='Пост', group=self.group)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        return len(queries)
+
+    def test_feed_pages_use_constant_number_of_queries(self):
+        """Число запросов ленты не зависит от количества постов."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.authors[0].username}
+            ),
+            reverse('posts:follow_index'),
+        )
+        self.add_posts(2)
+        expected = {url: self.count_queries(url) for url in urls}
+        self.add_posts(10)
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(expected[url]):
+                    self.authorized_client.get(url)
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.commenters = [
+            User.objects.create_user(username='commenter_{}'.format(i))
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def add_comments(self, commenters):
+        for commenter in commenters:
+            Comment.objects.create(
+                post=self.post, author=commenter, text=commenter.username
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_post_detail_queries_do_not_grow(self):
+        """Авторы комментариев загружаются одним запросом с комментариями."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.add_comments(self.commenters[:2])
+        expected = self.count_queries(url)
+        self.add_comments(self.commenters[2:])
+        self.assertEqual(self.count_queries(url), expected)
+
+    def test_load_more_fragment(self):
+        """Фрагмент «Показать ещё» отдаёт следующую страницу по курсору."""
+        self.add_comments(self.commenters)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['commenter_{}'.format(i) for i in range(5)],
+        )
+        after = comments.paginator.next_cursor
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'after': after},
+        )
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['commenter_{}'.format(i) for i in range(5, 10)],
+        )
+        self.assertContains(response, 'Показать ещё')
+        self.assertNotContains(response, '<html')
+
+    def test_load_more_fragment_of_missing_post(self):
+        """Фрагмент комментариев несуществующего поста отдаёт 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100])
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,129 @@
+from django.core.cache import cache
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, TestCase
+
+from posts.models import Comment, Follow, Group, Post, User
+
+from .query_guard import QueryTrace, growth, named_routes, route_url, trace
+
+URL_MODULES = ('posts.urls', 'users.urls', 'about.urls')
+SMALL, LARGE = 2, 12
+# Маршруты, которые меняют данные или сессию при GET.
+SKIPPED = {
+    'posts:profile_follow': 'создаёт подписку',
+    'posts:profile_unfollow': 'удаляет подписку',
+    'users:logout': 'завершает сессию клиента',
+}
+QUERIES = {
+    'posts:post_search': 'q=пост',
+}
+
+
+class RouteQueryGrowthTests(TestCase):
+    """Ни одна страница не делает больше запросов на большем наборе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='guard_reader')
+        cls.author = User.objects.create_user(username='guard_author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='guard-group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Главный пост'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.values = {
+            'post_id': cls.post.pk,
+            'slug': cls.group.slug,
+            'username': cls.author.username,
+            'uidb64': 'MQ',
+            'token': 'set-password',
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.added = 0
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def grow(self, size):
+        """
+        Доводит набор до size строк каждого вида.
+
+        Растут все связи, по которым шаблон может ходить в цикле:
+        посты разных авторов и групп в ленте и в группе, посты в
+        профиле, комментарии разных пользователей к посту, подписки.
+        """
+        for number in range(self.added, size):
+            other = User.objects.create_user(
+                username='guard_other_{}'.format(number)
+            )
+            group = Group.objects.create(
+                title='Группа {}'.format(number),
+                slug='guard-group-{}'.format(number),
+                description='Описание',
+            )
+            Follow.objects.create(user=self.reader, author=other)
+            Follow.objects.create(user=other, author=self.author)
+            Post.objects.create(author=other, group=group, text='Пост')
+            Post.objects.create(
+                author=self.author, group=self.group, text='Пост автора'
+            )
+            Comment.objects.create(
+                post=self.post, author=other, text='Комментарий'
+            )
+        self.added = max(self.added, size)
+
+    def routes(self):
+        for name, params in named_routes(*URL_MODULES):
+            if name not in SKIPPED:
+                yield name, route_url(
+                    name, params, self.values, QUERIES.get(name, '')
+                )
+
+    def test_every_route_checked(self):
+        """Новый маршрут нельзя добавить, не решив, как его проверять."""
+        names = {name for name, _ in named_routes(*URL_MODULES)}
+        self.assertLessEqual(set(SKIPPED), names)
+        self.assertIn('posts:index', names)
+        self.assertIn('users:signup', names)
+        self.assertIn('about:author', names)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов каждой страницы не зависит от объёма данных."""
+        self.grow(SMALL)
+        small = {name: trace(self.client, url) for name, url in self.routes()}
+        self.grow(LARGE)
+        for name, url in self.routes():
+            with self.subTest(route=name):
+                large = trace(self.client, url)
+                self.assertLessEqual(
+                    len(large), len(small[name]),
+                    '{}: {} -> {} запросов\n{}'.format(
+                        url, len(small[name]), len(large),
+                        '\n'.join(growth(small[name], large)),
+                    ),
+                )
+
+
+class QueryTraceTests(TestCase):
+    def test_reports_template_line(self):
+        """Запрос из цикла в шаблоне указывает на строку шаблона."""
+        author = User.objects.create_user(username='traced')
+        for _ in range(3):
+            Post.objects.create(author=author, text='Пост')
+        template = Template(
+            '{% for post in posts %}\n'
+            '{{ post.author.posts.count }}\n'
+            '{% endfor %}'
+        )
+        small, large = QueryTrace(), QueryTrace()
+        with connection.execute_wrapper(small):
+            template.render(Context({'posts': Post.objects.all()[:1]}))
+        with connection.execute_wrapper(large):
+            template.render(Context({'posts': Post.objects.all()}))
+        report = growth(small, large)
+        self.assertTrue(report)
+        self.assertIn(':2 post.author.posts.count', '\n'.join(report))
@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Group, Post, User
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Кошки', slug='cats', description='Про кошек'
+        )
+        cls.strong = Post.objects.create(
+            author=cls.author, text='Кошка и кошка спят', group=cls.group
+        )
+        cls.weak = Post.objects.create(
+            author=cls.other,
+            text='Кошка гуляет по длинной улице мимо старого дома',
+        )
+        Post.objects.create(author=cls.author, text='Собака лает')
+
+    def setUp(self):
+        cache.clear()
+        search.index.clear()
+
+    def found(self, **params):
+        response = self.client.get(reverse('posts:post_search'), params)
+        return list(response.context['page_obj'])
+
+    def test_results_ranked(self):
+        """Пост с частым совпадением в коротком тексте идёт первым."""
+        self.assertEqual(self.found(q='кошка'), [self.strong, self.weak])
+
+    def test_all_words_required(self):
+        """Пост должен содержать все слова запроса."""
+        self.assertEqual(self.found(q='кошка улице'), [self.weak])
+
+    def test_filters(self):
+        """Результаты фильтруются по группе и автору."""
+        self.assertEqual(self.found(q='кошка', group='cats'), [self.strong])
+        self.assertEqual(self.found(q='кошка', author='reader'), [self.weak])
+
+    def test_index_updated_on_save_and_delete(self):
+        """Сохранение и удаление поста сразу видны в поиске."""
+        self.assertEqual(self.found(q='собака'), [
+            Post.objects.get(text='Собака лает')
+        ])
+        post = Post.objects.create(author=self.other, text='Собака спит')
+        self.assertIn(post, self.found(q='собака'))
+        post.text = 'Попугай спит'
+        post.save()
+        self.assertNotIn(post, self.found(q='собака'))
+        self.assertEqual(self.found(q='попугай'), [post])
+        post.delete()
+        self.assertEqual(self.found(q='попугай'), [])
+
+    def test_pagination_keeps_query(self):
+        """Ссылки пагинатора сохраняют запрос и фильтры."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Кошка номер {}'.format(number))
+            for number in range(10)
+        )
+        search.index.clear()
+        response = self.client.get(
+            reverse('posts:post_search'), {'q': 'кошка', 'page': 2}
+        )
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertContains(response, 'href="?q=%D0%BA%D0%BE%D1%88%D0%BA')
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from posts.media import collect
+from posts.models import MediaFile, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\xFF\x00')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_GC_GRACE=0)
+@mock.patch('posts.signals.schedule_thumbnails')
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='collector')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content=SMALL_GIF, name='photo.gif'):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content, content_type='image/gif'),
+        )
+
+    def refs(self, name):
+        return MediaFile.objects.get(name=name).refs
+
+    def test_same_content_stored_once(self, schedule):
+        """Одинаковые картинки хранятся одним файлом в шардах по хешу."""
+        first = self.create_post(name='first.gif')
+        second = self.create_post(name='second.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/(..)/(..)/\1\2[0-9a-f]{60}\.gif$'
+        )
+        self.assertEqual(self.refs(first.image.name), 2)
+
+    def test_file_removed_with_last_post(self, schedule):
+        """Файл удаляется, только когда на него не осталось ссылок."""
+        first = self.create_post()
+        second = self.create_post()
+        name, path = first.image.name, first.image.path
+        first.delete()
+        self.assertEqual(self.refs(name), 1)
+        self.assertFalse(collect(name))
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertTrue(collect(name))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+
+    def test_edit_releases_old_image(self, schedule):
+        """Замена картинки снимает ссылку со старого файла."""
+        post = self.create_post()
+        old_name = post.image.name
+        post.image = SimpleUploadedFile(
+            'new.gif', OTHER_GIF, content_type='image/gif'
+        )
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertEqual(self.refs(old_name), 0)
+        self.assertEqual(self.refs(post.image.name), 1)
+        self.assertTrue(collect(old_name))
+
+    @override_settings(MEDIA_GC_GRACE=3600)
+    def test_fresh_orphan_kept(self, schedule):
+        """Недавно записанный файл без ссылок не удаляется сразу."""
+        post = self.create_post()
+        name, path = post.image.name, post.image.path
+        post.delete()
+        self.assertFalse(collect(name))
+        self.assertTrue(os.path.exists(path))
@@ -0,0 +1,180 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.thumbnails import (
+    PostThumbnailBackend, generate_thumbnails, hash_file
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\x00\xFF', 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        with mock.patch('posts.signals.schedule_thumbnails') as schedule:
+            self.post = Post.objects.create(
+                author=self.user,
+                text='Пост с картинкой',
+                image=SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            )
+        self.schedule = schedule
+
+    def test_upload_schedules_generation(self):
+        """Сохранение поста с картинкой ставит генерацию в очередь."""
+        self.schedule.assert_called_once_with(self.post.pk)
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """До генерации в ленте заглушка, после — миниатюра."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'img/placeholder.svg')
+        generate_thumbnails(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(len(self.post.image_hash), 64)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'img/placeholder.svg')
+        self.assertContains(response, '/media/cache/')
+
+    def test_picture_lists_widths_and_formats(self):
+        """В разметке есть srcset по всем ширинам и <source> для WebP."""
+        generate_thumbnails(self.post.pk)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertContains(response, '<source type="image/webp"')
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, ' {}w'.format(width))
+
+    def test_same_image_is_processed_once(self):
+        """Повторно загруженная картинка не обрабатывается заново."""
+        generate_thumbnails(self.post.pk)
+        with mock.patch('posts.signals.schedule_thumbnails'):
+            repost = Post.objects.create(
+                author=self.user,
+                text='Та же картинка',
+                image=SimpleUploadedFile(
+                    'copy.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            )
+        with mock.patch.object(
+            PostThumbnailBackend, '_create_thumbnail'
+        ) as create:
+            generate_thumbnails(repost.pk)
+        create.assert_not_called()
+        repost.refresh_from_db()
+        self.post.refresh_from_db()
+        self.assertEqual(repost.image_hash, self.post.image_hash)
+
+    def test_feed_fetches_thumbnails_in_one_query(self):
+        """Миниатюры страницы ленты достаются одним запросом к базе."""
+        for number in range(3):
+            with mock.patch('posts.signals.schedule_thumbnails'):
+                post = Post.objects.create(
+                    author=self.user,
+                    text='Ещё пост {}'.format(number),
+                    image=SimpleUploadedFile(
+                        'small{}.gif'.format(number), SMALL_GIF,
+                        content_type='image/gif'
+                    ),
+                )
+            generate_thumbnails(post.pk)
+        generate_thumbnails(self.post.pk)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertNotContains(response, 'img/placeholder.svg')
+
+    def test_bench_passes_start_cold(self):
+        """Оба прохода bench_thumbnails идут с холодным кэшем миниатюр."""
+        generate_thumbnails(self.post.pk)
+        out = StringIO()
+        call_command('bench_thumbnails', stdout=out)
+        per_post, batched = out.getvalue().splitlines()[1].split()[1:]
+        self.assertGreater(int(per_post), 0)
+        self.assertEqual(int(batched), 1)
+
+    def test_replaced_image_forgets_hash(self):
+        """После замены картинки варианты старой не показываются."""
+        generate_thumbnails(self.post.pk)
+        self.client.force_login(self.user)
+        with mock.patch('posts.signals.schedule_thumbnails') as schedule:
+            self.client.post(
+                reverse('posts:post_edit', args=[self.post.pk]),
+                {
+                    'text': 'Другая картинка',
+                    'image': SimpleUploadedFile(
+                        'blue.gif', OTHER_GIF, content_type='image/gif'
+                    ),
+                },
+            )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_hash, '')
+        schedule.assert_called_once_with(self.post.pk)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'img/placeholder.svg')
+
+    def test_image_replaced_during_generation(self):
+        """Хеш старой картинки не записывается поверх новой."""
+        with mock.patch('posts.signals.schedule_thumbnails'):
+            other = Post.objects.create(
+                author=self.user,
+                text='Другая картинка',
+                image=SimpleUploadedFile(
+                    'blue.gif', OTHER_GIF, content_type='image/gif'
+                ),
+            )
+        replaced = []
+
+        def hash_and_replace(file_):
+            digest = hash_file(file_)
+            if not replaced:
+                replaced.append(file_.name)
+                Post.objects.filter(pk=self.post.pk).update(
+                    image=other.image.name
+                )
+            return digest
+
+        with mock.patch('posts.thumbnails.hash_file', hash_and_replace):
+            generate_thumbnails(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image.name, other.image.name)
+        self.assertEqual(self.post.image_hash, hash_file(other.image))
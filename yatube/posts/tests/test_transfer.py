@@ -0,0 +1,136 @@
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+
+from posts.feeds import inbox
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.author = User.objects.create_user(username='writer')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Первый пост'
+        )
+        self.old_date = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        Post.objects.filter(pk=self.post.pk).update(pub_date=self.old_date)
+        Post.objects.create(author=self.reader, text='Пост, "с кавычками"')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def round_trip(self, data_format):
+        call_command(
+            'export_data', self.directory, '--format', data_format,
+            stdout=StringIO(),
+        )
+        Group.objects.all().delete()
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        out = StringIO()
+        call_command(
+            'import_data', self.directory, '--format', data_format,
+            '--batch-size', '1', stdout=out,
+        )
+        return out.getvalue()
+
+    def check_restored(self):
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.pub_date, self.old_date)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertTrue(
+            Post.objects.filter(text='Пост, "с кавычками"').exists()
+        )
+        self.assertEqual(Group.objects.get(slug='group').post_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).follower_count, 1
+        )
+        self.assertEqual(
+            [entry.post for entry in inbox(self.reader)], [post]
+        )
+
+    def test_jsonl_round_trip(self):
+        """Выгрузка в JSON Lines загружается обратно с теми же данными."""
+        output = self.round_trip('jsonl')
+        self.check_restored()
+        self.assertIn('строк/с', output)
+
+    def test_csv_round_trip(self):
+        """Выгрузка в CSV загружается обратно с теми же данными."""
+        self.round_trip('csv')
+        self.check_restored()
+
+    def test_unknown_user_rows_skipped(self):
+        """Строки авторов, которых нет в базе, пропускаются и считаются."""
+        call_command('export_data', self.directory, stdout=StringIO())
+        Post.objects.all().delete()
+        self.reader.delete()
+        out = StringIO()
+        call_command('import_data', self.directory, stdout=out)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertIn('пропущено без пользователя', out.getvalue())
+
+    def test_rows_of_skipped_parents_skipped(self):
+        """Комментарии к пропущенному посту и посты без группы не грузятся."""
+        ghost_post = Post.objects.get(author=self.reader)
+        Comment.objects.create(
+            post=ghost_post, author=self.author, text='К посту читателя'
+        )
+        call_command('export_data', self.directory, stdout=StringIO())
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Group.objects.create(title='Другая', slug='group', description='')
+        self.reader.delete()
+        out = StringIO()
+        call_command('import_data', self.directory, stdout=out)
+        connection.check_constraints()
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertIn('связанной строки: 2', out.getvalue())
+
+    def test_group_with_taken_id_skipped(self):
+        """Посты группы, чей id занят другой группой, к ней не цепляются."""
+        call_command('export_data', self.directory, stdout=StringIO())
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        other = Group.objects.create(
+            pk=self.group.pk, title='Другая', slug='other', description=''
+        )
+        out = StringIO()
+        call_command('import_data', self.directory, stdout=out)
+        self.assertFalse(other.post_set.exists())
+        self.assertEqual(Post.objects.get().author, self.reader)
+        self.assertFalse(Comment.objects.exists())
+        self.assertIn('занятого другой записью: 1', out.getvalue())
+
+    def test_post_with_taken_id_skipped(self):
+        """Комментарии поста, чей id занят другим постом, не загружаются."""
+        call_command('export_data', self.directory, stdout=StringIO())
+        Post.objects.all().delete()
+        Post.objects.create(
+            pk=self.post.pk, author=self.reader, text='Чужой пост'
+        )
+        out = StringIO()
+        call_command('import_data', self.directory, stdout=out)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).text, 'Чужой пост')
+        self.assertIn('занятого другой записью: 1', out.getvalue())
+
+    def test_missing_files(self):
+        """Импорт из каталога без выгрузки не начинается."""
+        with self.assertRaises(CommandError):
+            call_command('import_data', self.directory, stdout=StringIO())
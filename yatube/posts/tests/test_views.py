@@ -8,6 +8,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase
 from django.urls import reverse
 
+from posts.caching import get_version, scope
 from posts.models import Follow, Comment, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -179,7 +180,7 @@ class PostsViewsTests(TestCase):
         """Тестирование кэша на главной странице."""
         first_response = self.client.get(reverse('posts:index'))
         content_1 = first_response.content
-        Post.objects.all().delete()
+        Post.objects.update(text='Изменено в обход сигналов')
         second_response = self.client.get(reverse('posts:index'))
         content_2 = second_response.content
         self.assertEqual(content_1, content_2)
@@ -188,6 +189,31 @@ class PostsViewsTests(TestCase):
         content_3 = third_response.content
         self.assertNotEqual(content_1, content_3)
 
+    def test_index_cache_invalidated_on_post_changes(self):
+        """Удаление поста сразу сбрасывает кэш главной страницы."""
+        cache.clear()
+        first_response = self.client.get(reverse('posts:index'))
+        Post.objects.all().delete()
+        second_response = self.client.get(reverse('posts:index'))
+        self.assertNotEqual(first_response.content, second_response.content)
+
+    def test_other_group_cache_stays_warm(self):
+        """Пост в одной группе не сбрасывает кэш другой группы."""
+        cache.clear()
+        versions = (
+            get_version(scope('group', self.group_1.pk)),
+            get_version(scope('group', self.group_2.pk)),
+        )
+        Post.objects.create(
+            author=self.user_2, text='Новый пост', group=self.group_1
+        )
+        self.assertNotEqual(
+            get_version(scope('group', self.group_1.pk)), versions[0]
+        )
+        self.assertEqual(
+            get_version(scope('group', self.group_2.pk)), versions[1]
+        )
+
     def test_authorized_client_can_follow(self):
         """
         Авторизованный пользователь может подписываться
@@ -0,0 +1,209 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'thumbnails_pending:{}'
+PENDING_TIMEOUT = 60
+
+_executor = None
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    """
+    Бэкенд sorl для вариантов картинок постов.
+
+    Умеет искать готовую миниатюру без генерации и называет файлы по хешу
+    содержимого из опции content_hash, а не по имени исходника: одна и
+    та же картинка, загруженная повторно, не обрабатывается заново.
+    """
+
+    def thumbnail_options(self, **options):
+        """Опции миниатюры с теми же умолчаниями, что в get_thumbnail."""
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile миниатюры: по нему ищется запись в KV-хранилище."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self.thumbnail_options(**options)
+        )
+        return ImageFile(name, default.storage)
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        options = dict(options)
+        content_hash = options.pop('content_hash', None)
+        if content_hash is None:
+            return super()._get_thumbnail_filename(
+                source, geometry_string, options
+            )
+        key = tokey(content_hash, geometry_string, serialize(options))
+        return '{}{}/{}/{}.{}'.format(
+            thumbnail_settings.THUMBNAIL_PREFIX, key[:2], key[2:4], key,
+            EXTENSIONS.get(options['format'], options['format'].lower()),
+        )
+
+
+backend = PostThumbnailBackend()
+
+
+def image_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE
+    ]
+
+
+def image_variants():
+    """
+    Все варианты картинки поста: (формат, ширина, геометрия, опции).
+
+    Высота считается из ширины по POST_IMAGE_ASPECT, так что все
+    варианты одного формата годятся для одного srcset.
+    """
+    base_width, base_height = settings.POST_IMAGE_ASPECT
+    return [
+        (
+            image_format,
+            width,
+            '{}x{}'.format(width, round(width * base_height / base_width)),
+            dict(settings.POST_IMAGE_OPTIONS, format=image_format),
+        )
+        for image_format in image_formats()
+        for width in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+def hash_file(file_):
+    """sha256 содержимого файла, читаемого кусками."""
+    digest = hashlib.sha256()
+    file_.open('rb')
+    try:
+        for chunk in file_.chunks():
+            digest.update(chunk)
+    finally:
+        file_.close()
+    return digest.hexdigest()
+
+
+def load_thumbnails(posts):
+    """
+    Достаёт варианты картинок всех постов одним обращением к хранилищу.
+
+    Результат кладётся в post.thumbnails: {(формат, ширина): ImageFile
+    или None}. У поста, для картинки которого ещё не посчитан хеш,
+    вариантов нет.
+    """
+    variants = image_variants()
+    files = {}
+    for post in posts:
+        post.thumbnails = {}
+        if post.image and post.image_hash:
+            for image_format, width, geometry, options in variants:
+                files[post, image_format, width] = backend.thumbnail_file(
+                    post.image, geometry,
+                    content_hash=post.image_hash, **options
+                )
+    get_many = getattr(default.kvstore, 'get_many', None)
+    if get_many is not None:
+        found = get_many(files.values())
+    else:
+        found = {
+            image_file.key: default.kvstore.get(image_file)
+            for image_file in files.values()
+        }
+    for (post, image_format, width), image_file in files.items():
+        post.thumbnails[image_format, width] = found[image_file.key]
+
+
+def prefetch_thumbnails(posts):
+    """
+    Загружает варианты картинок страницы ленты до рендера.
+
+    Без этого тег post_picture ищет варианты каждого поста отдельно.
+    """
+    if settings.THUMBNAIL_PREFETCH:
+        load_thumbnails(posts)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def generate_thumbnails(post_id):
+    """
+    Генерирует все варианты картинки поста из image_variants.
+
+    Варианты называются по хешу содержимого, поэтому для уже встречавшейся
+    картинки они находятся в KV-хранилище и не создаются повторно.
+    Хеш записывается, только если картинка поста всё ещё та, что
+    хешировалась; вместе с ним меняется updated, что сбрасывает
+    закэшированные карточки. Если картинку успели заменить, варианты
+    генерируются уже для новой: её задача не встала в очередь, пока
+    была эта.
+    """
+    from .models import Post
+    from .signals import invalidate_post
+
+    while True:
+        post = Post.objects.filter(pk=post_id).first()
+        if post is None or not post.image:
+            break
+        image_hash = hash_file(post.image)
+        for _, _, geometry, options in image_variants():
+            backend.get_thumbnail(
+                post.image, geometry, content_hash=image_hash, **options
+            )
+        if Post.objects.filter(pk=post_id, image=post.image.name).update(
+            image_hash=image_hash, updated=timezone.now()
+        ):
+            invalidate_post(post)
+            break
+    cache.delete(PENDING_KEY.format(post_id))
+
+
+def _run_in_worker(post_id):
+    try:
+        generate_thumbnails(post_id)
+    except Exception:
+        logger.exception('Ошибка генерации миниатюр поста %s', post_id)
+    finally:
+        connection.close()
+
+
+def schedule_thumbnails(post_id):
+    """Ставит генерацию миниатюр в очередь после коммита транзакции."""
+    if not cache.add(PENDING_KEY.format(post_id), 1, PENDING_TIMEOUT):
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(_run_in_worker, post_id)
+    )
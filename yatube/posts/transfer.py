@@ -0,0 +1,330 @@
+import csv
+import json
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+from . import search
+from .caching import INDEX, invalidate, scope
+from .counters import recount, recount_media
+from .feeds import rebuild_inboxes
+from .graph import reset as reset_graph
+from .models import Comment, Follow, Group, MediaFile, Post, User, UserStats
+
+FORMATS = ('jsonl', 'csv')
+
+# Что выгружается для каждой модели, в порядке загрузки. Пользователи
+# не переносятся: ссылки на них пишутся по username и при загрузке
+# сопоставляются с пользователями целевой базы.
+TABLES = (
+    ('groups', Group, ('id', 'title', 'slug', 'description')),
+    ('posts', Post, (
+        'id', 'text', 'pub_date', 'updated', 'author__username',
+        'group_id', 'image', 'image_hash',
+    )),
+    ('comments', Comment, (
+        'id', 'post_id', 'author__username', 'text', 'created',
+    )),
+    ('follows', Follow, (
+        'id', 'user__username', 'author__username', 'created',
+    )),
+)
+
+
+# Естественные ключи: по ним видно, что строка с тем же id в целевой базе —
+# та же запись, а не другая, случайно получившая этот id.
+NATURAL_KEYS = {
+    Group: ('slug',),
+    Post: ('author_id', 'text'),
+    Comment: ('post_id', 'author_id', 'text'),
+    Follow: ('user_id', 'author_id'),
+}
+
+
+def file_name(table, data_format):
+    return '{}.{}'.format(table, data_format)
+
+
+class Progress:
+    """Печатает число обработанных строк и скорость раз в every строк."""
+
+    def __init__(self, write, table, every):
+        self.write = write
+        self.table = table
+        self.every = every
+        self.count = 0
+        self.started = time.monotonic()
+
+    @property
+    def rate(self):
+        return self.count / max(time.monotonic() - self.started, 1e-9)
+
+    def add(self, count):
+        before = self.count // self.every
+        self.count += count
+        if self.count // self.every > before:
+            self.write('{}: {} строк, {:.0f} строк/с'.format(
+                self.table, self.count, self.rate
+            ))
+
+    def done(self, extra=''):
+        self.write('{}: готово, {} строк за {:.1f} с, {:.0f} строк/с{}'.format(
+            self.table, self.count, time.monotonic() - self.started,
+            self.rate, extra,
+        ))
+
+
+def write_rows(stream, rows, fields, data_format):
+    """Пишет строки по одной: память не зависит от размера таблицы."""
+    if data_format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield
+    else:
+        for row in rows:
+            stream.write(json.dumps(
+                row, cls=DjangoJSONEncoder, ensure_ascii=False
+            ))
+            stream.write('\n')
+            yield
+
+
+def read_rows(stream, data_format):
+    """Читает строки по одной; пустые значения CSV читаются как None."""
+    if data_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value or None for key, value in row.items()}
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def keep_timestamps(model):
+    """
+    Отключает auto_now и auto_now_add, чтобы bulk_create сохранил даты
+    из файла, а не текущее время.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class RowLoader:
+    """
+    Превращает строки файла в объекты модели для bulk_create.
+
+    Строка пропускается и учитывается в skipped, если её пользователя нет
+    в базе или нет строки, на которую она ссылается: поста комментария,
+    группы поста. Такая строка могла не загрузиться раньше — например,
+    пост неизвестного автора или группа с уже занятым slug.
+
+    Если id строки в базе занят другой записью (естественные ключи не
+    совпадают), строка пропускается и учитывается в conflicts. id всех
+    незагруженных строк копятся в dropped, общем для всех таблиц
+    импорта: строки, ссылающиеся на них, тоже пропускаются, а не
+    цепляются к чужой записи с тем же id.
+    """
+
+    def __init__(self, model, fields, dropped):
+        self.model = model
+        self.fields = fields
+        self.dropped = dropped
+        self.users = {}
+        self.parents = {}
+        self.skipped = 0
+        self.conflicts = 0
+
+    def drop(self, pk):
+        self.dropped.setdefault(self.model, set()).add(pk)
+
+    def resolve_users(self, rows):
+        """Достаёт id пользователей пачки одним запросом."""
+        names = {
+            row[field] for row in rows for field in self.fields
+            if field.endswith('__username') and row.get(field)
+        } - set(self.users)
+        self.users.update(
+            User.objects.filter(
+                username__in=names
+            ).values_list('username', 'pk')
+        )
+
+    def resolve_parents(self, rows):
+        """Какие из групп и постов, упомянутых в пачке, есть в базе."""
+        for name in self.fields:
+            if name == 'id' or not name.endswith('_id'):
+                continue
+            field = self.model._meta.get_field(name[:-3])
+            related = field.related_model
+            ids = {field.to_python(row[name]) for row in rows if row.get(name)}
+            self.parents[name] = set(
+                related.objects.filter(pk__in=ids).values_list('pk', flat=True)
+            ) - self.dropped.get(related, set())
+
+    def skip(self, row):
+        self.skipped += 1
+        self.drop(self.model._meta.pk.to_python(row.get('id')))
+
+    def build(self, row):
+        values = {}
+        for name in self.fields:
+            value = row.get(name)
+            if name.endswith('__username'):
+                user_id = self.users.get(value)
+                if value and user_id is None:
+                    self.skip(row)
+                    return None
+                values[name[:-len('__username')] + '_id'] = user_id
+                continue
+            field = self.model._meta.get_field(
+                name[:-3] if name.endswith('_id') else name
+            )
+            if value is None and not field.null:
+                # В CSV пустая строка и NULL неотличимы.
+                value = '' if field.empty_strings_allowed else None
+            value = None if value is None else field.to_python(value)
+            if value is not None and name in self.parents \
+                    and value not in self.parents[name]:
+                self.skip(row)
+                return None
+            values[field.attname] = value
+        return self.model(**values)
+
+    def without_conflicts(self, objects):
+        """Отбрасывает строки, чей id в базе занят другой записью."""
+        keys = NATURAL_KEYS[self.model]
+        existing = {
+            pk: tuple(values) for pk, *values in self.model.objects.filter(
+                pk__in=[obj.pk for obj in objects]
+            ).values_list('pk', *keys)
+        }
+        kept = []
+        for obj in objects:
+            natural = tuple(getattr(obj, key) for key in keys)
+            if existing.get(obj.pk, natural) != natural:
+                self.conflicts += 1
+                self.drop(obj.pk)
+                continue
+            kept.append(obj)
+        return kept
+
+    def objects(self, rows):
+        self.resolve_users(rows)
+        self.resolve_parents(rows)
+        return self.without_conflicts(
+            [obj for obj in map(self.build, rows) if obj is not None]
+        )
+
+
+def reset_sequences(models):
+    """Сдвигает автоинкременты за вставленные явно id (PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def export_table(stream, model, fields, data_format, chunk_size,
+                 progress):
+    """
+    Выгружает таблицу в поток.
+
+    Строки читаются через iterator(chunk_size), без кэша QuerySet, так
+    что в памяти одновременно не больше одного куска.
+    """
+    rows = model.objects.order_by('pk').values(*fields).iterator(
+        chunk_size=chunk_size
+    )
+    for _ in write_rows(stream, rows, fields, data_format):
+        progress.add(1)
+
+
+def touched_scopes(obj):
+    """Области кэша, которые затрагивает загруженная строка."""
+    if isinstance(obj, Group):
+        return [scope('group', obj.pk)]
+    if isinstance(obj, Post):
+        scopes = [scope('profile', obj.author_id)]
+        if obj.group_id:
+            scopes.append(scope('group', obj.group_id))
+        return scopes
+    if isinstance(obj, Comment):
+        return [scope('post', obj.post_id)]
+    return [
+        scope(name, pk) for name, pk in (
+            ('feed', obj.user_id),
+            ('profile', obj.user_id),
+            ('profile', obj.author_id),
+        ) if pk
+    ]
+
+
+def import_table(stream, model, fields, data_format, batch_size,
+                 progress, touched, dropped):
+    """
+    Загружает таблицу пачками через bulk_create.
+
+    bulk_create не шлёт post_save, поэтому счётчики, ленты и кэш не
+    трогаются построчно: их пересчитывает finish_import, а затронутые
+    области кэша копятся в touched. Строки, которые уже есть в базе, или
+    нарушающие уникальность пропускаются; id незагруженных строк копятся
+    в dropped (см. RowLoader).
+    Возвращает два числа: строки, пропущенные из-за неизвестных
+    пользователей или отсутствующих связанных строк, и строки, чей id
+    занят другой записью.
+    """
+    loader = RowLoader(model, fields, dropped)
+    with keep_timestamps(model):
+        for rows in batches(read_rows(stream, data_format), batch_size):
+            objects = loader.objects(rows)
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+            for obj in objects:
+                touched.update(touched_scopes(obj))
+            progress.add(len(rows))
+    return loader.skipped, loader.conflicts
+
+
+def finish_import(touched):
+    """
+    Пересчитывает после загрузки всё, что обычно ведут сигналы.
+
+    Делается один раз на весь импорт, а не на каждую строку: счётчики,
+    ссылки на файлы, ленты подписок, поисковый индекс в памяти, граф
+    подписок в кэше и версии затронутых областей кэша. Возвращает число
+    обработанных подписок.
+    """
+    reset_sequences([model for _, model, _ in TABLES])
+    recount(User, UserStats, Group, Post, Comment, Follow)
+    recount_media(Post, MediaFile)
+    follows = rebuild_inboxes()
+    search.index.clear()
+    reset_graph()
+    invalidate(INDEX, *sorted(touched))
+    return follows
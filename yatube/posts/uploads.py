@@ -0,0 +1,95 @@
+import os
+import tempfile
+from functools import wraps
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+# Форматы, в которых оригинал сохраняется как есть; остальные — в JPEG.
+KEEP_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# Метаданные, которые Pillow переносит из info при пересохранении.
+METADATA_KEYS = ('exif', 'icc_profile', 'xmp', 'XML:com.adobe.xmp')
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загрузку во временный файл, но не больше POST_IMAGE_MAX_BYTES.
+
+    Хвост слишком большого файла дочитывается из запроса и отбрасывается,
+    а в size остаётся настоящий размер: по нему форма отклоняет файл,
+    не открывая его.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        limit = settings.POST_IMAGE_MAX_BYTES - self.received
+        self.received += len(raw_data)
+        if limit > 0:
+            self.file.write(raw_data[:limit])
+
+
+def limit_uploads(view):
+    """
+    Пишет загрузки вьюхи через LimitedTemporaryFileUploadHandler.
+
+    Остальные вьюхи (и админка) работают со штатными обработчиками.
+    Обработчики можно заменить только до первого чтения request.POST, а
+    его читает проверка CSRF в middleware, поэтому проверка переносится
+    внутрь, после замены.
+    """
+    protected = csrf_protect(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [LimitedTemporaryFileUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
+
+
+def open_image(upload):
+    """Открывает картинку, прочитав только заголовок, без декодирования."""
+    if hasattr(upload, 'temporary_file_path'):
+        return Image.open(upload.temporary_file_path())
+    upload.seek(0)
+    return Image.open(upload)
+
+
+def normalize_image(upload, image):
+    """
+    Пересохраняет картинку, уменьшив до POST_IMAGE_MAX_SIDE по большей
+    стороне и повернув по EXIF уже после уменьшения.
+
+    JPEG декодируется сразу в уменьшенном масштабе (draft), поэтому
+    полный кадр в памяти не оказывается. Метаданные (EXIF, ICC, текст
+    PNG) при пересохранении не переносятся. Результат пишется во
+    временный файл, в памяти держится не больше
+    FILE_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    image_format = image.format if image.format in KEEP_FORMATS else 'JPEG'
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    image.draft('RGB', (max_side, max_side))
+    image.thumbnail((max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    name = '{}.{}'.format(
+        os.path.splitext(os.path.basename(upload.name))[0],
+        KEEP_FORMATS[image_format],
+    )
+    for key in METADATA_KEYS:
+        image.info.pop(key, None)
+    buffer = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    image.save(buffer, format=image_format, quality=90, optimize=True)
+    result = File(buffer, name=name)
+    result.size = buffer.tell()
+    result.content_type = Image.MIME[image_format]
+    buffer.seek(0)
+    return result
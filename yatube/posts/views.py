@@ -1,74 +1,169 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from . import graph
+from .caching import (
+    INDEX, cache_context, cache_page_versioned, condition_versioned, scope
+)
+from .feeds import feed_page, feed_scopes
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Follow, Group, Post, User
+from .paginators import get_page
+from .search import search_posts
+from .thumbnails import prefetch_thumbnails
+from .uploads import limit_uploads
 
+# Комментарии листаются от старых к новым по ключу (created, id).
+COMMENTS_KEY = ('created', 'pk')
+# Подписчики и подписки листаются от новых к старым по дате подписки.
+FOLLOWS_KEY = ('created', 'pk')
 
-@cache_page(20)
+
+def group_scopes(request, slug):
+    pk = Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    return (scope('group', pk),)
+
+
+def profile_scopes(request, username):
+    pk = User.objects.filter(
+        username=username
+    ).values_list('pk', flat=True).first()
+    return (scope('profile', pk),)
+
+
+def profile_condition_scopes(request, username):
+    """
+    Области для условного GET профиля.
+
+    Кнопка подписки подставляется в страницу при каждой отдаче, поэтому
+    к областям страницы добавляется лента посетителя: она сбрасывается,
+    когда он подписывается или отписывается.
+    """
+    scopes = profile_scopes(request, username)
+    if request.user.is_authenticated:
+        scopes += (scope('feed', request.user.pk),)
+    return scopes
+
+
+def post_scopes(request, post_id):
+    """
+    Области страницы поста: сам пост, его автор (число постов)
+    и группа (название). Достаются одним запросом по первичному ключу.
+    """
+    author_id, group_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id'
+    ).first() or (None, None)
+    scopes = (scope('post', post_id), scope('profile', author_id))
+    if group_id:
+        scopes += (scope('group', group_id),)
+    return scopes
+
+
+@cache_page_versioned(lambda request: (INDEX,))
 def index(request):
     """Главная страница."""
     template = 'posts/index.html'
-    post_list = Post.objects.select_related('group').all()
-    paginator = Paginator(post_list, settings.PER_PAGE_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = get_page(request, post_list)
+    prefetch_thumbnails(page_obj)
     context = {
         'page_obj': page_obj,
+        **cache_context(INDEX),
     }
     return render(request, template, context)
 
 
+@condition_versioned(group_scopes, vary_on_user=True)
+@cache_page_versioned(group_scopes)
 def group_posts(request, slug):
     """Сообщества."""
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.post_set.all()
-    paginator = Paginator(post_list, settings.PER_PAGE_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.post_set.for_feed()
+    page_obj = get_page(request, post_list)
+    prefetch_thumbnails(page_obj)
     context = {
         'group': group,
         'page_obj': page_obj,
+        **cache_context(scope('group', group.pk)),
     }
     return render(request, template, context)
 
 
+@condition_versioned(profile_condition_scopes, vary_on_user=True)
+@cache_page_versioned(profile_scopes)
 def profile(request, username):
     template = 'posts/profile.html'
-    user = get_object_or_404(User, username=username)
-    posts = user.posts.all()
-    paginator = Paginator(posts, settings.PER_PAGE_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        author=user, user=request.user
-    ).exists()
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = user.posts.for_feed()
+    page_obj = get_page(request, posts)
+    prefetch_thumbnails(page_obj)
     context = {
         'author': user,
         'page_obj': page_obj,
-        'following': following,
+        **cache_context(scope('profile', user.pk)),
     }
     return render(request, template, context)
 
 
+@condition_versioned(post_scopes, vary_on_user=True)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = get_page(
+        request,
+        post.comments.select_related('author'),
+        per_page=settings.COMMENTS_PER_PAGE,
+        key=COMMENTS_KEY,
+        descending=False,
+    )
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        **cache_context(scope('post', post.pk)),
+    }
+    return render(request, template, context)
+
+
+def comments_scopes(request, post_id):
+    """
+    Области фрагмента комментариев. Пост проверяется здесь, до ETag:
+    для несуществующего поста отдаётся 404 без валидаторов.
+    """
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return (scope('post', post_id),)
+
+
+@condition_versioned(comments_scopes)
+def post_comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать ещё»."""
+    template = 'posts/includes/comments_page.html'
+    comments = get_page(
+        request,
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        per_page=settings.COMMENTS_PER_PAGE,
+        key=COMMENTS_KEY,
+        descending=False,
+    )
+    context = {
+        'post_id': post_id,
+        'comments': comments,
     }
     return render(request, template, context)
 
 
 @login_required
+@limit_uploads
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -86,6 +181,7 @@ def post_create(request):
 
 
 @login_required
+@limit_uploads
 def post_edit(request, post_id):
     is_edit = True
     post = get_object_or_404(Post, pk=post_id)
@@ -98,7 +194,7 @@ def post_edit(request, post_id):
         files=request.FILES or None,
         instance=post
     )
-    if request.method == 'POST' and form.is_valid:
+    if request.method == 'POST' and form.is_valid():
         form.save()
         return redirect('posts:post_detail', post_id)
     context = {
@@ -121,15 +217,39 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def post_search(request):
+    """Поиск по постам с фильтром по группе и автору."""
+    template = 'posts/search.html'
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        results = search_posts(
+            form.cleaned_data['q'],
+            author=form.cleaned_data['author'],
+            group=form.cleaned_data['group'],
+        )
+        page_obj = Paginator(
+            results, settings.PER_PAGE_COUNT
+        ).get_page(request.GET.get('page'))
+        prefetch_thumbnails(page_obj)
+    query = request.GET.copy()
+    query.pop('page', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'page_query': query.urlencode() + '&' if query else '',
+    }
+    return render(request, template, context)
+
+
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, settings.PER_PAGE_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = feed_page(request)
+    prefetch_thumbnails(page_obj)
     context = {
         'page_obj': page_obj,
+        **cache_context(*feed_scopes(request.user.pk)),
     }
     return render(request, template, context)
 
@@ -155,3 +275,51 @@ def profile_unfollow(request, username):
     )
     following.delete()
     return redirect('posts:profile', username=username)
+
+
+def follow_list(request, username, kind):
+    """
+    Подписчики или подписки пользователя, по курсору.
+
+    Статус подписки посетителя на людей страницы проверяется по его
+    множеству подписок в кэше, одним обращением на всю страницу.
+    """
+    template = 'posts/follow_list.html'
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    if kind == graph.FOLLOWERS:
+        field, follows = 'user', author.following
+    else:
+        field, follows = 'author', author.follower
+    page_obj = get_page(
+        request,
+        follows.exclude(**{field: None}).select_related(field).order_by(
+            '-created', '-pk'
+        ),
+        per_page=settings.FOLLOWS_PER_PAGE,
+        key=FOLLOWS_KEY,
+    )
+    page_obj.object_list = [getattr(follow, field) for follow in page_obj]
+    followed = set()
+    if request.user.is_authenticated:
+        followed = graph.following_among(
+            request.user.pk, [person.pk for person in page_obj]
+        )
+    context = {
+        'author': author,
+        'kind': kind,
+        'page_obj': page_obj,
+        'followed': followed,
+    }
+    return render(request, template, context)
+
+
+@condition_versioned(profile_condition_scopes, vary_on_user=True)
+def followers(request, username):
+    return follow_list(request, username, graph.FOLLOWERS)
+
+
+@condition_versioned(profile_condition_scopes, vary_on_user=True)
+def following(request, username):
+    return follow_list(request, username, graph.FOLLOWING)
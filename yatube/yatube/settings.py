@@ -54,10 +54,10 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,15 +65,20 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# Тулбар нужен только при разработке: в продакшене он лишь замедляет
+# каждый запрос.
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.profiling.ProfiledTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -158,18 +163,112 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PER_PAGE_COUNT = 10
 
+COMMENTS_PER_PAGE = 20
+
+# Конфигурация полнотекстового поиска PostgreSQL для постов.
+SEARCH_CONFIG = 'russian'
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ограничения для картинок постов: размер файла, число пикселей по
+# заголовку и большая сторона, до которой уменьшается оригинал. Во
+# вьюхах постов загрузки пишутся во временный файл не больше
+# POST_IMAGE_MAX_BYTES (posts.uploads.limit_uploads).
+POST_IMAGE_MAX_BYTES = int(os.getenv('POST_IMAGE_MAX_BYTES', 10 * 1024 ** 2))
+POST_IMAGE_MAX_PIXELS = int(os.getenv('POST_IMAGE_MAX_PIXELS', 50 * 10 ** 6))
+POST_IMAGE_MAX_SIDE = int(os.getenv('POST_IMAGE_MAX_SIDE', 2560))
+
+# Сколько секунд не удалять файл картинки, на который не осталось ссылок:
+# его мог только что переиспользовать ещё не сохранённый пост.
+MEDIA_GC_GRACE = int(os.getenv('MEDIA_GC_GRACE', 60 * 60))
+
+# Кэш настраивается через окружение: CACHE_BACKEND принимает короткое имя
+# из CACHE_BACKENDS или полный путь к классу бэкенда.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+
+CACHE_LOCATIONS = {
+    'db': 'yatube_cache',
+    'file': os.path.join(BASE_DIR, 'cache'),
+    'memcached': '127.0.0.1:11211',
+    'redis': 'redis://127.0.0.1:6379/1',
+}
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', CACHE_LOCATIONS.get(CACHE_BACKEND, '')
+        ),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'yatube'),
+        'VERSION': int(os.getenv('CACHE_VERSION', 1)),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', 300)),
     }
 }
 
+# Страницы сбрасываются сигналами, поэтому таймаут может быть большим.
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 60 * 60 * 6))
+
+# Сколько секунд после истечения отдавать устаревшую страницу,
+# пока один воркер её пересчитывает.
+PAGE_CACHE_STALE_TIMEOUT = int(os.getenv('PAGE_CACHE_STALE_TIMEOUT', 60))
+
+# Варианты картинок постов для srcset и <picture>: генерируются в фоне
+# после загрузки для каждой ширины и формата. Последний формат запасной,
+# форматы, которые не умеет сохранять Pillow, пропускаются.
+POST_IMAGE_WIDTHS = [
+    int(width)
+    for width in os.getenv('POST_IMAGE_WIDTHS', '480,960,1440').split(',')
+]
+POST_IMAGE_FORMATS = os.getenv(
+    'POST_IMAGE_FORMATS', 'AVIF,WEBP,JPEG'
+).split(',')
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_OPTIONS = {'crop': 'center', 'upscale': True}
+
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
+# Загружать миниатюры всей страницы ленты одним обращением к хранилищу.
+THUMBNAIL_PREFETCH = True
+
+# Сколько секунд живут закэшированные множества подписок и подписчиков.
+# Они правятся при подписке и отписке, срок лишь страхует от потерянной
+# при гонке правки.
+FOLLOW_GRAPH_TIMEOUT = int(os.getenv('FOLLOW_GRAPH_TIMEOUT', 60 * 60))
+
+# Подписчиков и подписок на странице списка.
+FOLLOWS_PER_PAGE = 30
+
+# С какого числа подписчиков посты автора не раскладываются по лентам
+# подписчиков, а подмешиваются в ленту при чтении. 0 — раскладывать всё.
+FEED_CELEBRITY_FOLLOWERS = int(os.getenv('FEED_CELEBRITY_FOLLOWERS', 10000))
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Профилирование запросов в продакшене (core.profiling): какая доля
+# запросов замеряется, с какой длительности запрос считается медленным,
+# сколько медленных запросов помнить и как часто сбрасывать сводку в кэш.
+# Запросы вне выборки только засекаются; медленные из них тоже попадают в
+# отчёт, но без SQL.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '1') == '1'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.01))
+PROFILING_SLOW_MS = int(os.getenv('PROFILING_SLOW_MS', 500))
+PROFILING_SLOW_SAMPLES = int(os.getenv('PROFILING_SLOW_SAMPLES', 50))
+PROFILING_TOP_QUERIES = 5
+PROFILING_FLUSH_INTERVAL = int(os.getenv('PROFILING_FLUSH_INTERVAL', 10))
+PROFILING_TTL = 60 * 60 * 24
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]